@@ -95,11 +95,13 @@ def create_app():
     from services.scheduled_reports import init_scheduled_reports_db
     from services.dynamic_groups import init_dynamic_groups_db
     from services.app_settings import init_settings_db
+    from services.rbac import init_rbac_db
     with app.app_context():
         init_db()
         init_scheduled_reports_db()
         init_dynamic_groups_db()
         init_settings_db()
+        init_rbac_db()
 
         # Load saved settings from SQLite, overriding env vars
         from services.app_settings import get_all_settings
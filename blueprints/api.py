@@ -140,7 +140,7 @@ def disable_user(sam):
     success, user = svc_get_user(sam)
     if not success:
         return jsonify({'error': user}), 404
-    dis_success, msg = svc_disable(user['dn'])
+    dis_success, msg = svc_disable(user['dn'], current_uac=user['uac'])
     log_action('disable_user', sam, msg, 'success' if dis_success else 'failure')
     if not dis_success:
         return jsonify({'error': msg}), 400
@@ -155,7 +155,7 @@ def enable_user(sam):
     success, user = svc_get_user(sam)
     if not success:
         return jsonify({'error': user}), 404
-    en_success, msg = svc_enable(user['dn'])
+    en_success, msg = svc_enable(user['dn'], current_uac=user['uac'])
     log_action('enable_user', sam, msg, 'success' if en_success else 'failure')
     if not en_success:
         return jsonify({'error': msg}), 400
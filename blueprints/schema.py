@@ -1,6 +1,6 @@
-from flask import Blueprint, render_template, request, flash
+from flask import Blueprint, render_template, request, flash, redirect, url_for
 
-from services.ad_schema import get_object_classes, get_attribute_definitions
+from services.ad_schema import get_object_classes, get_object_class_detail, get_attribute_definitions
 from services.rbac import require_permission
 
 schema_bp = Blueprint('schema', __name__, url_prefix='/schema')
@@ -31,3 +31,13 @@ def index():
     return render_template('schema/index.html',
                            tab=tab, query=query,
                            classes=classes, attrs=attrs)
+
+
+@schema_bp.route('/class/<ldap_name>')
+@require_permission('schema.view')
+def class_detail(ldap_name):
+    ok, cls = get_object_class_detail(ldap_name)
+    if not ok:
+        flash(f'Failed to load object class: {cls}', 'danger')
+        return redirect(url_for('schema.index', tab='classes'))
+    return render_template('schema/class_detail.html', cls=cls)
@@ -8,12 +8,14 @@ search_bp = Blueprint('search', __name__, url_prefix='/search')
 @search_bp.route('/')
 def index():
     query = request.args.get('q', '').strip()
+    exhaustive = request.args.get('exhaustive') == '1'
     results = None
     total = 0
     if query:
-        success, data, total = global_search(query)
+        success, data, total = global_search(query, exhaustive=exhaustive)
         if success:
             results = data
         else:
             results = {'users': [], 'groups': [], 'computers': [], 'ous': []}
-    return render_template('search/results.html', query=query, results=results, total=total)
+    return render_template('search/results.html', query=query, results=results, total=total,
+                           exhaustive=exhaustive)
@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, flash
+import json
 
-from services.ad_service_accounts import get_service_accounts
+from flask import Blueprint, render_template, flash, Response, stream_with_context
+
+from services.ad_service_accounts import get_service_accounts, iter_service_accounts
 
 svc_bp = Blueprint('service_accounts', __name__, url_prefix='/service-accounts')
 
@@ -12,3 +14,16 @@ def index():
         flash(f'Failed to load service accounts: {data}', 'danger')
         data = []
     return render_template('service_accounts/index.html', accounts=data)
+
+
+@svc_bp.route('/stream')
+def stream():
+    """Service accounts as newline-delimited JSON, unsorted, as AD returns them."""
+    def generate():
+        try:
+            for account in iter_service_accounts():
+                yield json.dumps(account) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -3,7 +3,7 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from services.app_settings import (
     SETTING_GROUPS, get_all_settings, save_settings,
 )
-from services.rbac import require_permission
+from services.rbac import require_permission, invalidate_role_cache
 from services.audit import log_action
 
 settings_bp = Blueprint('settings', __name__, url_prefix='/settings')
@@ -29,6 +29,8 @@ def index():
             for key, val in new_settings.items():
                 if val:
                     current_app.config[key] = val
+            # Role groups may have changed
+            invalidate_role_cache()
 
         return redirect(url_for('settings.index'))
 
@@ -1,6 +1,6 @@
-from flask import Blueprint, render_template, flash
+from flask import Blueprint, render_template, flash, redirect, url_for
 
-from services.ad_sites import get_sites, get_site_links
+from services.ad_sites import get_sites, get_site_links, clear_topology_cache
 from services.rbac import require_permission
 
 sites_bp = Blueprint('sites', __name__, url_prefix='/sites')
@@ -26,3 +26,11 @@ def index():
                            sites=sites, links=links,
                            total_subnets=total_subnets,
                            total_servers=total_servers)
+
+
+@sites_bp.route('/refresh', methods=['POST'])
+@require_permission('sites.manage')
+def refresh():
+    clear_topology_cache()
+    flash('Site topology reloaded from Active Directory.', 'success')
+    return redirect(url_for('sites.index'))
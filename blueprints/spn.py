@@ -25,9 +25,19 @@ def detail(sam):
     return render_template('spn/detail.html', obj=obj)
 
 
+def _get_posted_object(sam):
+    """Look up the object for an add/remove form, by the DN it posted if any."""
+    object_dn = request.form.get('dn', '').strip()
+    if object_dn:
+        success, obj = get_spns_for_object(object_dn, is_dn=True)
+        if success and obj['sam'].lower() == sam.lower():
+            return success, obj
+    return get_spns_for_object(sam)
+
+
 @spn_bp.route('/<sam>/add', methods=['POST'])
 def add(sam):
-    success, obj = get_spns_for_object(sam)
+    success, obj = _get_posted_object(sam)
     if not success:
         flash(f'Object not found: {obj}', 'danger')
         return redirect(url_for('spn.index'))
@@ -43,7 +53,7 @@ def add(sam):
 
 @spn_bp.route('/<sam>/remove', methods=['POST'])
 def remove(sam):
-    success, obj = get_spns_for_object(sam)
+    success, obj = _get_posted_object(sam)
     if not success:
         flash(f'Object not found: {obj}', 'danger')
         return redirect(url_for('spn.index'))
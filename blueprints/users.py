@@ -114,7 +114,7 @@ def disable(sam):
     if not success:
         flash(f'User not found: {user}', 'danger')
         return redirect(url_for('users.list_users'))
-    dis_success, msg = disable_user(user['dn'])
+    dis_success, msg = disable_user(user['dn'], current_uac=user['uac'])
     flash(msg, 'success' if dis_success else 'danger')
     log_action('disable_user', sam, msg, 'success' if dis_success else 'failure')
     return redirect(url_for('users.detail', sam=sam))
@@ -126,7 +126,7 @@ def enable(sam):
     if not success:
         flash(f'User not found: {user}', 'danger')
         return redirect(url_for('users.list_users'))
-    en_success, msg = enable_user(user['dn'])
+    en_success, msg = enable_user(user['dn'], current_uac=user['uac'])
     flash(msg, 'success' if en_success else 'danger')
     log_action('enable_user', sam, msg, 'success' if en_success else 'failure')
     return redirect(url_for('users.detail', sam=sam))
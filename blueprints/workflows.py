@@ -95,7 +95,7 @@ def offboard():
 
         # Step 1: Disable account
         if 'disable_account' in request.form:
-            ds, dm = disable_user(user['dn'])
+            ds, dm = disable_user(user['dn'], current_uac=user['uac'])
             results.append(f'Disable account: {"OK" if ds else dm}')
             log_action('offboard_disable', sam, dm, 'success' if ds else 'failure')
 
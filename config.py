@@ -16,6 +16,11 @@ class Config:
     USER_OU = os.environ.get('USER_OU')
     GROUPS_OU = os.environ.get('GROUPS_OU', '')
     COMPUTERS_OU = os.environ.get('COMPUTERS_OU', '')
+    USER_SEARCH_BASE = os.environ.get('USER_SEARCH_BASE', '')
+
+    # LDAP connection pool
+    LDAP_POOL_SIZE = int(os.environ.get('LDAP_POOL_SIZE', '10'))
+    LDAP_POOL_LIFETIME = int(os.environ.get('LDAP_POOL_LIFETIME', '600'))
 
     # Branding (customizable per deployment)
     APP_NAME = os.environ.get('APP_NAME', 'AD Tools')
@@ -25,6 +30,10 @@ class Config:
     # Domain Admins always get 'admin' role
     HELPDESK_GROUP = os.environ.get('HELPDESK_GROUP', '')
     VIEWER_GROUP = os.environ.get('VIEWER_GROUP', '')
+    # Seconds a resolved role is reused before AD is asked again. Changes made
+    # through this app apply at once; changes made directly in AD can take
+    # this long to be seen at login.
+    RBAC_CACHE_TTL = int(os.environ.get('RBAC_CACHE_TTL', '60'))
 
     @property
     def domain_display_name(self):
@@ -1,23 +1,104 @@
+import queue
 import ssl
-from ldap3 import Server, Connection, ALL, NTLM, Tls
+import time
+from contextlib import contextmanager
+
+from ldap3 import Server, Connection, ALL, NONE, NTLM, SYNC, Tls
+from ldap3.core.exceptions import LDAPBindError
 from flask import current_app
 
+from .ad_naming import clear_naming_contexts
+
+# One Server per DC URL, shared by every connection so the RootDSE and
+# schema are only downloaded on the first bind of the process.
+_servers = {}
+
+
+def _get_server(url):
+    server = _servers.get(url)
+    if server is None:
+        tls_config = Tls(validate=ssl.CERT_NONE, version=ssl.PROTOCOL_TLSv1_2)
+        server = Server(
+            url,
+            get_info=ALL,
+            use_ssl=True,
+            tls=tls_config,
+        )
+        _servers[url] = server
+    return server
 
-def get_connection():
-    """Create and return an authenticated LDAPS connection to Active Directory."""
+
+def get_connection(client_strategy=SYNC):
+    """Create and return an authenticated LDAPS connection to Active Directory.
+
+    Long-running reports pass client_strategy=RESTARTABLE so ldap3
+    transparently reconnects and retries after a transient network error.
+    """
     cfg = current_app.config
-    tls_config = Tls(validate=ssl.CERT_NONE, version=ssl.PROTOCOL_TLSv1_2)
-    server = Server(
-        f"ldaps://{cfg['AD_SERVER_IP']}:636",
-        get_info=ALL,
-        use_ssl=True,
-        tls=tls_config,
-    )
-    conn = Connection(
-        server,
-        user=f"{cfg['AD_DOMAIN']}\\{cfg['AD_USER']}",
-        password=cfg['AD_PASSWORD'],
-        authentication=NTLM,
-        auto_bind=True,
-    )
+    server = _get_server(f"ldaps://{cfg['AD_SERVER_IP']}:636")
+    try:
+        conn = Connection(
+            server,
+            user=f"{cfg['AD_DOMAIN']}\\{cfg['AD_USER']}",
+            password=cfg['AD_PASSWORD'],
+            authentication=NTLM,
+            client_strategy=client_strategy,
+            auto_bind=True,
+        )
+    except LDAPBindError:
+        # Credentials or target changed; don't trust cached directory layout
+        clear_naming_contexts()
+        raise
+    # Info and schema are now attached to the shared Server; stop later
+    # binds from fetching them again.
+    server.get_info = NONE
     return conn
+
+
+# Idle bound connections per (DC URL, bind user), reused across requests
+_pools = {}
+
+
+@contextmanager
+def pooled_connection():
+    """Check out a bound connection from the process-wide pool.
+
+    The connection goes back to the pool when the block exits, instead of
+    paying TCP + TLS + NTLM bind again on the next request. Connections older
+    than LDAP_POOL_LIFETIME seconds, or closed by the DC, are discarded.
+    """
+    cfg = current_app.config
+    key = (cfg['AD_SERVER_IP'], cfg['AD_DOMAIN'], cfg['AD_USER'])
+    pool = _pools.setdefault(key, queue.LifoQueue(maxsize=cfg.get('LDAP_POOL_SIZE', 10)))
+    lifetime = cfg.get('LDAP_POOL_LIFETIME', 600)
+
+    conn = None
+    while conn is None:
+        try:
+            conn, created = pool.get_nowait()
+        except queue.Empty:
+            conn, created = get_connection(), time.monotonic()
+            break
+        if conn.closed or not conn.bound or time.monotonic() - created > lifetime:
+            _discard(conn)
+            conn = None
+
+    try:
+        yield conn
+    except BaseException:
+        # State of the connection is unknown after an error; don't reuse it
+        _discard(conn)
+        raise
+    if conn.closed or not conn.bound:
+        return
+    try:
+        pool.put_nowait((conn, created))
+    except queue.Full:
+        _discard(conn)
+
+
+def _discard(conn):
+    try:
+        conn.unbind()
+    except Exception:
+        pass
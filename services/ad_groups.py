@@ -3,6 +3,7 @@ from ldap3.utils.dn import escape_rdn
 from flask import current_app
 
 from .ad_connection import get_connection
+from .rbac import invalidate_role_cache
 
 GROUP_ATTRIBUTES = [
     'cn', 'sAMAccountName', 'distinguishedName', 'description',
@@ -132,6 +133,7 @@ def add_member(group_dn, member_dn):
     try:
         conn = get_connection()
         conn.extend.microsoft.add_members_to_groups(member_dn, group_dn)
+        invalidate_role_cache()
         return True, 'Member added successfully.'
     except Exception as e:
         return False, str(e)
@@ -145,6 +147,7 @@ def remove_member(group_dn, member_dn):
     try:
         conn = get_connection()
         conn.extend.microsoft.remove_members_from_groups(member_dn, group_dn)
+        invalidate_role_cache()
         return True, 'Member removed successfully.'
     except Exception as e:
         return False, str(e)
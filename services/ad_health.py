@@ -11,6 +11,7 @@ from ldap3 import SUBTREE, BASE, ALL
 from flask import current_app
 
 from .ad_connection import get_connection
+from .ad_naming import get_naming_contexts
 
 
 def get_fsmo_roles():
@@ -43,7 +44,7 @@ def get_fsmo_roles():
 
         # Schema Master (forest-level)
         # Schema naming context
-        schema_dn = conn.server.info.other.get('schemaNamingContext', [''])[0] if conn.server.info and conn.server.info.other else ''
+        schema_dn = get_naming_contexts(conn)['schemaNamingContext']
         if schema_dn:
             conn.search(schema_dn, '(objectClass=*)', search_scope=BASE,
                          attributes=['fSMORoleOwner'])
@@ -51,7 +52,7 @@ def get_fsmo_roles():
                 roles['Schema Master'] = _ntds_to_dc(str(conn.entries[0].fSMORoleOwner.value))
 
         # Domain Naming Master (forest-level)
-        config_dn = conn.server.info.other.get('configurationNamingContext', [''])[0] if conn.server.info and conn.server.info.other else ''
+        config_dn = get_naming_contexts(conn)['configurationNamingContext']
         if config_dn:
             partitions_dn = f"CN=Partitions,{config_dn}"
             conn.search(partitions_dn, '(objectClass=*)', search_scope=BASE,
@@ -166,9 +167,7 @@ def get_sites_and_subnets():
     try:
         conn = get_connection()
 
-        config_dn = ''
-        if conn.server.info and conn.server.info.other:
-            config_dn = conn.server.info.other.get('configurationNamingContext', [''])[0]
+        config_dn = get_naming_contexts(conn)['configurationNamingContext']
         if not config_dn:
             return False, 'Cannot determine configuration naming context'
 
@@ -235,9 +234,7 @@ def get_replication_status():
     try:
         conn = get_connection()
 
-        config_dn = ''
-        if conn.server.info and conn.server.info.other:
-            config_dn = conn.server.info.other.get('configurationNamingContext', [''])[0]
+        config_dn = get_naming_contexts(conn)['configurationNamingContext']
         if not config_dn:
             return False, 'Cannot determine configuration naming context'
 
@@ -285,9 +282,7 @@ def get_tombstone_lifetime():
     try:
         conn = get_connection()
 
-        config_dn = ''
-        if conn.server.info and conn.server.info.other:
-            config_dn = conn.server.info.other.get('configurationNamingContext', [''])[0]
+        config_dn = get_naming_contexts(conn)['configurationNamingContext']
         if not config_dn:
             return False, 'Cannot determine configuration naming context'
 
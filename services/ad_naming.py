@@ -0,0 +1,47 @@
+"""RootDSE naming context lookup.
+
+Naming contexts never change for the lifetime of a forest, so they are read
+from RootDSE once per DC and cached for the rest of the process.
+"""
+
+from ldap3 import BASE
+
+NAMING_CONTEXT_ATTRIBUTES = [
+    'configurationNamingContext',
+    'schemaNamingContext',
+    'defaultNamingContext',
+    'rootDomainNamingContext',
+]
+
+_naming_contexts = {}
+
+
+def get_naming_contexts(conn):
+    """Return the RootDSE naming contexts for the DC conn is bound to.
+
+    Must be called before a search whose conn.entries are still needed,
+    since the first call per DC issues its own RootDSE search. Contexts the
+    DC did not return come back as ''.
+    """
+    host = conn.server.host
+    contexts = _naming_contexts.get(host)
+    if contexts is None:
+        conn.search('', '(objectClass=*)', search_scope=BASE,
+                    attributes=NAMING_CONTEXT_ATTRIBUTES)
+        attrs = conn.response[0]['attributes'] if conn.response else {}
+        contexts = {}
+        for name in NAMING_CONTEXT_ATTRIBUTES:
+            value = attrs.get(name)
+            if isinstance(value, list):
+                value = value[0] if value else ''
+            contexts[name] = str(value or '')
+        # A failed or empty RootDSE read is retried on the next call rather
+        # than cached for the life of the process
+        if all(contexts.values()):
+            _naming_contexts[host] = contexts
+    return contexts
+
+
+def clear_naming_contexts():
+    """Forget cached naming contexts, e.g. after the DC rejects a bind."""
+    _naming_contexts.clear()
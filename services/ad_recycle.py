@@ -1,10 +1,39 @@
-from ldap3 import SUBTREE, BASE
+from operator import itemgetter
+
+from ldap3 import SUBTREE, BASE, MODIFY_DELETE, MODIFY_REPLACE
 from ldap3.core.exceptions import LDAPException
 from flask import current_app
 
 from .ad_connection import get_connection
 
 
+def _strip_del_suffix(cn):
+    """AD appends \\nDEL:<GUID> to the CN of deleted objects; drop it."""
+    return cn.partition('\n')[0]
+
+
+# Deleted objects share a handful of objectClass chains; memoize the type per chain
+_TYPE_BY_CLASSES = {}
+
+
+def _object_type(object_classes):
+    key = frozenset(str(c).lower() for c in object_classes)
+    obj_type = _TYPE_BY_CLASSES.get(key)
+    if obj_type is None:
+        if 'computer' in key:
+            obj_type = 'Computer'
+        elif 'user' in key:
+            obj_type = 'User'
+        elif 'group' in key:
+            obj_type = 'Group'
+        elif 'organizationalunit' in key:
+            obj_type = 'OU'
+        else:
+            obj_type = 'Other'
+        _TYPE_BY_CLASSES[key] = obj_type
+    return obj_type
+
+
 def get_deleted_objects():
     """Query the AD Recycle Bin for deleted objects."""
     cfg = current_app.config
@@ -19,30 +48,14 @@ def get_deleted_objects():
             '(&(isDeleted=TRUE)(|(objectClass=user)(objectClass=group)(objectClass=computer)(objectClass=organizationalUnit)))',
             search_scope=SUBTREE,
             attributes=['cn', 'sAMAccountName', 'objectClass', 'whenChanged',
-                         'distinguishedName', 'lastKnownParent', 'isDeleted'],
+                         'lastKnownParent'],
             controls=[('1.2.840.113556.1.4.417', True, None)],  # LDAP_SERVER_SHOW_DELETED_OID
         )
 
         objects = []
         for entry in conn.entries:
-            obj_classes = [str(c).lower() for c in entry.objectClass]
-            if 'user' in obj_classes and 'computer' not in obj_classes:
-                obj_type = 'User'
-            elif 'computer' in obj_classes:
-                obj_type = 'Computer'
-            elif 'group' in obj_classes:
-                obj_type = 'Group'
-            elif 'organizationalunit' in obj_classes:
-                obj_type = 'OU'
-            else:
-                obj_type = 'Other'
-
-            cn = str(entry.cn) if entry.cn else ''
-            # AD appends \nDEL:<GUID> to CN of deleted objects; clean it
-            if '\n' in cn:
-                cn = cn.split('\n')[0]
-            if '\x0a' in cn:
-                cn = cn.split('\x0a')[0]
+            obj_type = _object_type(entry.objectClass.values)
+            cn = _strip_del_suffix(str(entry.cn) if entry.cn else '')
 
             objects.append({
                 'dn': str(entry.entry_dn),
@@ -53,7 +66,7 @@ def get_deleted_objects():
                 'last_known_parent': str(entry.lastKnownParent) if hasattr(entry, 'lastKnownParent') and entry.lastKnownParent else '',
             })
 
-        objects.sort(key=lambda x: x['when_deleted'], reverse=True)
+        objects.sort(key=itemgetter('when_deleted'), reverse=True)
         return True, objects
     except LDAPException as e:
         err = str(e)
@@ -86,30 +99,36 @@ def restore_deleted_object(deleted_dn, new_ou_dn=None):
             return False, 'Deleted object not found'
 
         entry = conn.entries[0]
-        cn = str(entry.cn) if entry.cn else ''
-        if '\n' in cn:
-            cn = cn.split('\n')[0]
-        if '\x0a' in cn:
-            cn = cn.split('\x0a')[0]
+        cn = _strip_del_suffix(str(entry.cn) if entry.cn else '')
 
         target_ou = new_ou_dn or (str(entry.lastKnownParent) if entry.lastKnownParent else cfg['BASE_DN'])
 
-        # Restore: modify isDeleted to remove it and move to target OU
+        # Restore: remove isDeleted and move to the target OU in a single
+        # modify, so the object is never left renamed but still deleted
         new_rdn = f"CN={cn}"
-        result = conn.modify_dn(
+        new_dn = f"{new_rdn},{target_ou}"
+        result = conn.modify(
             deleted_dn,
-            new_rdn,
-            new_superior=target_ou,
+            {
+                'isDeleted': [(MODIFY_DELETE, [])],
+                'distinguishedName': [(MODIFY_REPLACE, [new_dn])],
+            },
             controls=[('1.2.840.113556.1.4.417', True, None)],
         )
+        if not result and conn.result.get('description') == 'unwillingToPerform':
+            # Fall back to rename-then-undelete for DCs that reject the combined form
+            result = conn.modify_dn(
+                deleted_dn,
+                new_rdn,
+                new_superior=target_ou,
+                controls=[('1.2.840.113556.1.4.417', True, None)],
+            )
+            if result:
+                result = conn.modify(new_dn, {'isDeleted': [(MODIFY_DELETE, [])]})
         if not result:
             desc = conn.result.get('description', 'Restore failed')
             return False, desc
 
-        # Clear isDeleted attribute
-        new_dn = f"{new_rdn},{target_ou}"
-        conn.modify(new_dn, {'isDeleted': [('MODIFY_DELETE', [])]})
-
         return True, f"Object '{cn}' restored to {target_ou}"
     except Exception as e:
         return False, str(e)
@@ -8,15 +8,21 @@ from ldap3 import SUBTREE, BASE
 from flask import current_app
 
 from .ad_connection import get_connection
+from .ad_naming import get_naming_contexts
 
 
-def _get_config_dn(conn):
+def _safe(entry, attr):
     try:
-        info = conn.server.info
-        return str(info.other.get('configurationNamingContext', [None])[0])
+        return entry[attr].value
     except Exception:
-        base = current_app.config['BASE_DN']
-        return f"CN=Configuration,{base}"
+        return None
+
+
+def _get_config_dn(conn):
+    config_dn = get_naming_contexts(conn)['configurationNamingContext']
+    if not config_dn:
+        raise ValueError('Cannot determine configuration naming context')
+    return config_dn
 
 
 def get_replication_status():
@@ -32,7 +38,7 @@ def get_replication_status():
             f"CN=Sites,{config_dn}",
             '(objectClass=nTDSDSA)',
             search_scope=SUBTREE,
-            attributes=['cn', 'distinguishedName'],
+            attributes=['cn'],
         )
         ntds_entries = [str(e.entry_dn) for e in conn.entries]
 
@@ -56,13 +62,7 @@ def get_replication_status():
                         attributes=['cn', 'fromServer', 'enabledConnection', 'whenCreated',
                                     'schedule', 'options', 'transportType'])
             for entry in conn.entries:
-                def _safe(attr, e=entry):
-                    try:
-                        return e[attr].value
-                    except Exception:
-                        return None
-
-                from_server = str(_safe('fromServer') or '')
+                from_server = str(_safe(entry, 'fromServer') or '')
                 # Extract source server name from the fromServer DN
                 from_name = ''
                 if from_server:
@@ -72,8 +72,8 @@ def get_replication_status():
                             from_name = p.replace('CN=', '')
                             break
 
-                enabled = _safe('enabledConnection')
-                options = int(_safe('options') or 0)
+                enabled = _safe(entry, 'enabledConnection')
+                options = int(_safe(entry, 'options') or 0)
                 auto_generated = bool(options & 1)
 
                 connections.append({
@@ -83,8 +83,8 @@ def get_replication_status():
                     'from_dn': from_server,
                     'enabled': enabled if enabled is not None else True,
                     'auto_generated': auto_generated,
-                    'when_created': str(_safe('whenCreated') or ''),
-                    'name': str(_safe('cn') or ''),
+                    'when_created': str(_safe(entry, 'whenCreated') or ''),
+                    'name': str(_safe(entry, 'cn') or ''),
                 })
 
         # Query replication metadata from RootDSE
@@ -113,16 +113,11 @@ def get_replication_status():
             attributes=['cn', 'dNSHostName', 'operatingSystem', 'whenCreated'],
         )
         for entry in conn.entries:
-            def _safe(attr, e=entry):
-                try:
-                    return e[attr].value
-                except Exception:
-                    return None
             dcs.append({
-                'cn': str(_safe('cn') or ''),
-                'dns_host': str(_safe('dNSHostName') or ''),
-                'os': str(_safe('operatingSystem') or ''),
-                'when_created': str(_safe('whenCreated') or ''),
+                'cn': str(_safe(entry, 'cn') or ''),
+                'dns_host': str(_safe(entry, 'dNSHostName') or ''),
+                'os': str(_safe(entry, 'operatingSystem') or ''),
+                'when_created': str(_safe(entry, 'whenCreated') or ''),
             })
 
         return True, {
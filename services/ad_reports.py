@@ -1,19 +1,26 @@
 from datetime import datetime, timedelta, timezone
+from operator import itemgetter
 
-from ldap3 import SUBTREE
+from ldap3 import SUBTREE, RESTARTABLE
 from flask import current_app
 
 from .ad_connection import get_connection
 
 USER_FILTER = '(&(objectClass=user)(objectCategory=person))'
 
+PRIVILEGED_GROUPS = [
+    'Domain Admins', 'Enterprise Admins', 'Schema Admins',
+    'Administrators', 'Account Operators', 'Server Operators',
+    'Backup Operators', 'Print Operators',
+]
+
 
 def get_password_expiry_report(days_threshold=30):
     """Get users whose passwords will expire within the given number of days."""
     cfg = current_app.config
     conn = None
     try:
-        conn = get_connection()
+        conn = get_connection(client_strategy=RESTARTABLE)
 
         # Get domain password policy (maxPwdAge from domain root)
         conn.search(cfg['BASE_DN'], '(objectClass=domain)',
@@ -30,15 +37,20 @@ def get_password_expiry_report(days_threshold=30):
         if max_pwd_days == 0:
             return True, []  # Passwords never expire
 
-        # Get all users with pwdLastSet
-        conn.search(cfg['BASE_DN'], USER_FILTER, search_scope=SUBTREE,
-                     attributes=['cn', 'sAMAccountName', 'pwdLastSet',
-                                 'userAccountControl', 'distinguishedName'])
+        # Get all users with pwdLastSet, a page at a time so each page is
+        # processed while the next one is still being returned
+        entries = conn.extend.standard.paged_search(
+            cfg['BASE_DN'], USER_FILTER, search_scope=SUBTREE,
+            attributes=['cn', 'sAMAccountName', 'pwdLastSet', 'userAccountControl'],
+            paged_size=500, generator=True)
 
         now = datetime.now(timezone.utc)
         users = []
-        for entry in conn.entries:
-            uac = int(entry.userAccountControl.value) if entry.userAccountControl.value else 512
+        for entry in entries:
+            if entry['type'] != 'searchResEntry':
+                continue
+            attrs = entry['attributes']
+            uac = int(attrs.get('userAccountControl') or 512)
             # Skip disabled accounts
             if uac & 2:
                 continue
@@ -46,12 +58,12 @@ def get_password_expiry_report(days_threshold=30):
             if uac & 65536:
                 continue
 
-            pwd_last_set = entry.pwdLastSet.value
+            pwd_last_set = attrs.get('pwdLastSet')
             if not pwd_last_set or str(pwd_last_set) in ('0', '1601-01-01 00:00:00+00:00'):
                 users.append({
-                    'cn': str(entry.cn),
-                    'sam': str(entry.sAMAccountName),
-                    'dn': str(entry.entry_dn),
+                    'cn': str(attrs.get('cn') or ''),
+                    'sam': str(attrs.get('sAMAccountName') or ''),
+                    'dn': entry['dn'],
                     'pwd_last_set': 'Never',
                     'expires': 'Must change',
                     'days_remaining': -1,
@@ -68,15 +80,15 @@ def get_password_expiry_report(days_threshold=30):
 
             if days_remaining <= days_threshold:
                 users.append({
-                    'cn': str(entry.cn),
-                    'sam': str(entry.sAMAccountName),
-                    'dn': str(entry.entry_dn),
+                    'cn': str(attrs.get('cn') or ''),
+                    'sam': str(attrs.get('sAMAccountName') or ''),
+                    'dn': entry['dn'],
                     'pwd_last_set': pwd_set_dt.strftime('%Y-%m-%d %H:%M'),
                     'expires': expiry_date.strftime('%Y-%m-%d'),
                     'days_remaining': days_remaining,
                 })
 
-        users.sort(key=lambda x: x['days_remaining'])
+        users.sort(key=itemgetter('days_remaining'))
         return True, users
     except Exception as e:
         return False, str(e)
@@ -85,6 +97,18 @@ def get_password_expiry_report(days_threshold=30):
             conn.unbind()
 
 
+def _reachable_groups(group_dns, parents):
+    """Return group_dns plus every group reachable from them through parents."""
+    seen = set()
+    stack = list(group_dns)
+    while stack:
+        dn = stack.pop()
+        if dn not in seen:
+            seen.add(dn)
+            stack.extend(parents.get(dn, ()))
+    return seen
+
+
 def get_privileged_accounts():
     """Get accounts with elevated privileges (adminCount=1, Domain Admins, etc.)."""
     cfg = current_app.config
@@ -99,66 +123,76 @@ def get_privileged_accounts():
         admin_filter = f'(&{USER_FILTER}(adminCount=1))'
         conn.search(cfg['BASE_DN'], admin_filter, search_scope=SUBTREE,
                      attributes=['cn', 'sAMAccountName', 'displayName', 'memberOf',
-                                 'userAccountControl', 'distinguishedName'])
+                                 'userAccountControl'])
         for entry in conn.entries:
             dn = str(entry.entry_dn)
             if dn in seen_dns:
                 continue
             seen_dns.add(dn)
-            uac = int(entry.userAccountControl.value) if entry.userAccountControl.value else 512
-            status = 'disabled' if uac & 2 else 'enabled'
-            groups = [str(g) for g in entry.memberOf.values] if entry.memberOf.value else []
+            uac = entry.userAccountControl.value
+            display_name = entry.displayName.value
             privileged.append({
-                'cn': str(entry.cn),
-                'sam': str(entry.sAMAccountName),
-                'display_name': str(entry.displayName) if entry.displayName.value else '',
-                'status': status,
+                'cn': str(entry.cn.value),
+                'sam': str(entry.sAMAccountName.value),
+                'display_name': str(display_name) if display_name else '',
+                'status': 'disabled' if int(uac or 512) & 2 else 'enabled',
                 'dn': dn,
-                'groups': groups,
+                'groups': [str(g) for g in entry.memberOf.values],
                 'source': 'adminCount=1',
             })
 
-        # 2. Find members of well-known privileged groups using nested membership
-        priv_groups = [
-            'Domain Admins', 'Enterprise Admins', 'Schema Admins',
-            'Administrators', 'Account Operators', 'Server Operators',
-            'Backup Operators', 'Print Operators',
-        ]
-        for group_name in priv_groups:
-            group_filter = f'(&(objectClass=group)(cn={group_name}))'
-            conn.search(cfg['BASE_DN'], group_filter, search_scope=SUBTREE,
-                         attributes=['distinguishedName'])
-            if not conn.entries:
+        # 2. Resolve all privileged group DNs in one round-trip
+        groups_filter = '(&(objectClass=group)(|{}))'.format(
+            ''.join(f'(cn={name})' for name in PRIVILEGED_GROUPS))
+        conn.search(cfg['BASE_DN'], groups_filter, search_scope=SUBTREE,
+                     attributes=['cn'])
+        group_dns = {str(e.cn.value): str(e.entry_dn) for e in conn.entries}
+        # (lowercased DN, name) in report order, for attributing each user's source
+        priv_groups = [(group_dns[name].lower(), name) for name in PRIVILEGED_GROUPS
+                       if name in group_dns]
+        if not priv_groups:
+            return True, privileged
+
+        # Use LDAP_MATCHING_RULE_IN_CHAIN for nested membership
+        chain = ''.join(f'(memberOf:1.2.840.113556.1.4.1941:={dn})'
+                        for dn in group_dns.values())
+
+        # 3. Every group nested below a privileged group, with its direct
+        # parents, so a user's memberOf can be walked up to the privileged groups
+        conn.search(cfg['BASE_DN'], f'(&(objectClass=group)(|{chain}))',
+                     search_scope=SUBTREE, attributes=['memberOf'])
+        parents = {
+            str(e.entry_dn).lower(): [str(g).lower() for g in e.memberOf.values]
+            for e in conn.entries
+        }
+
+        # 4. Every user nested in any privileged group, in one search
+        conn.search(cfg['BASE_DN'], f'(&{USER_FILTER}(|{chain}))', search_scope=SUBTREE,
+                     attributes=['cn', 'sAMAccountName', 'displayName',
+                                 'userAccountControl', 'memberOf'])
+        by_dn = {p['dn']: p for p in privileged}
+        for entry in conn.entries:
+            dn = str(entry.entry_dn)
+            reachable = _reachable_groups((str(g).lower() for g in entry.memberOf.values), parents)
+            sources = [name for group_dn, name in priv_groups if group_dn in reachable]
+            if dn in seen_dns:
+                p = by_dn[dn]
+                for group_name in sources:
+                    if group_name not in p['source']:
+                        p['source'] += f', {group_name}'
                 continue
-            group_dn = str(conn.entries[0].entry_dn)
-
-            # Use LDAP_MATCHING_RULE_IN_CHAIN for nested membership
-            member_filter = (
-                f'(&{USER_FILTER}'
-                f'(memberOf:1.2.840.113556.1.4.1941:={group_dn}))'
-            )
-            conn.search(cfg['BASE_DN'], member_filter, search_scope=SUBTREE,
-                         attributes=['cn', 'sAMAccountName', 'displayName',
-                                     'userAccountControl', 'distinguishedName'])
-            for entry in conn.entries:
-                dn = str(entry.entry_dn)
-                if dn in seen_dns:
-                    for p in privileged:
-                        if p['dn'] == dn and group_name not in p['source']:
-                            p['source'] += f', {group_name}'
-                    continue
-                seen_dns.add(dn)
-                uac = int(entry.userAccountControl.value) if entry.userAccountControl.value else 512
-                status = 'disabled' if uac & 2 else 'enabled'
-                privileged.append({
-                    'cn': str(entry.cn),
-                    'sam': str(entry.sAMAccountName),
-                    'display_name': str(entry.displayName) if entry.displayName.value else '',
-                    'status': status,
-                    'dn': dn,
-                    'groups': [],
-                    'source': group_name,
-                })
+            seen_dns.add(dn)
+            uac = entry.userAccountControl.value
+            display_name = entry.displayName.value
+            privileged.append({
+                'cn': str(entry.cn.value),
+                'sam': str(entry.sAMAccountName.value),
+                'display_name': str(display_name) if display_name else '',
+                'status': 'disabled' if int(uac or 512) & 2 else 'enabled',
+                'dn': dn,
+                'groups': [],
+                'source': ', '.join(sources) or 'Nested membership',
+            })
 
         return True, privileged
     except Exception as e:
@@ -173,7 +207,7 @@ def get_stale_objects(days_inactive=90, object_type='users'):
     cfg = current_app.config
     conn = None
     try:
-        conn = get_connection()
+        conn = get_connection(client_strategy=RESTARTABLE)
 
         cutoff = datetime.now(timezone.utc) - timedelta(days=days_inactive)
         # Convert to Windows FILETIME (100-nanosecond intervals since 1601-01-01)
@@ -183,31 +217,37 @@ def get_stale_objects(days_inactive=90, object_type='users'):
         if object_type == 'computers':
             ldap_filter = f'(&(objectClass=computer)(lastLogonTimestamp<={filetime}))'
             attrs = ['cn', 'sAMAccountName', 'lastLogonTimestamp', 'whenCreated',
-                     'userAccountControl', 'operatingSystem', 'distinguishedName']
+                     'userAccountControl', 'operatingSystem']
         else:
             ldap_filter = f'(&{USER_FILTER}(lastLogonTimestamp<={filetime}))'
             attrs = ['cn', 'sAMAccountName', 'lastLogonTimestamp', 'whenCreated',
-                     'userAccountControl', 'distinguishedName']
+                     'userAccountControl']
 
-        conn.search(cfg['BASE_DN'], ldap_filter, search_scope=SUBTREE,
-                     attributes=attrs, paged_size=1000)
+        # Walk every page rather than only the first; entries are processed
+        # as each page arrives instead of after the whole result is buffered
+        entries = conn.extend.standard.paged_search(
+            cfg['BASE_DN'], ldap_filter, search_scope=SUBTREE,
+            attributes=attrs, paged_size=500, generator=True)
 
         objects = []
-        for entry in conn.entries:
-            uac = int(entry.userAccountControl.value) if entry.userAccountControl.value else 512
+        for entry in entries:
+            if entry['type'] != 'searchResEntry':
+                continue
+            values = entry['attributes']
+            uac = int(values.get('userAccountControl') or 512)
             status = 'disabled' if uac & 2 else 'enabled'
-            last_logon = str(entry.lastLogonTimestamp) if entry.lastLogonTimestamp.value else 'Never'
+            last_logon = values.get('lastLogonTimestamp')
 
             obj = {
-                'cn': str(entry.cn) if entry.cn else '',
-                'sam': str(entry.sAMAccountName) if entry.sAMAccountName else '',
-                'dn': str(entry.entry_dn),
-                'last_logon': last_logon,
-                'when_created': str(entry.whenCreated) if entry.whenCreated else '',
+                'cn': str(values.get('cn') or ''),
+                'sam': str(values.get('sAMAccountName') or ''),
+                'dn': entry['dn'],
+                'last_logon': str(last_logon) if last_logon else 'Never',
+                'when_created': str(values.get('whenCreated') or ''),
                 'status': status,
             }
             if object_type == 'computers':
-                obj['os'] = str(entry.operatingSystem) if entry.operatingSystem else ''
+                obj['os'] = str(values.get('operatingSystem') or '')
             objects.append(obj)
 
         return True, objects
@@ -1,9 +1,10 @@
 """AD Schema Browser - browse objectClass and attribute definitions."""
 
-from ldap3 import SUBTREE, BASE
-from flask import current_app
+from ldap3 import SUBTREE, BASE, LEVEL, RESTARTABLE
+from ldap3.utils.conv import escape_filter_chars
 
 from .ad_connection import get_connection
+from .ad_naming import get_naming_contexts
 
 
 SYNTAX_MAP = {
@@ -27,21 +28,63 @@ SYNTAX_MAP = {
 }
 
 
-def _get_schema_dn(conn):
-    """Get the Schema naming context from RootDSE."""
+def _safe(entry, attr):
+    try:
+        return entry[attr].value
+    except Exception:
+        return None
+
+
+def _safe_list(entry, attr):
     try:
-        info = conn.server.info
-        return str(info.other.get('schemaNamingContext', [None])[0])
+        val = entry[attr].value
+        if isinstance(val, list):
+            return val
+        return [val] if val else []
     except Exception:
-        base = current_app.config['BASE_DN']
-        return f"CN=Schema,CN=Configuration,{base}"
+        return []
+
+
+def _get_schema_dn(conn):
+    """Get the Schema naming context from RootDSE."""
+    schema_dn = get_naming_contexts(conn)['schemaNamingContext']
+    if not schema_dn:
+        raise ValueError('Cannot determine schema naming context')
+    return schema_dn
+
 
+CATEGORY_MAP = {0: 'Abstract', 1: 'Structural', 2: 'Auxiliary'}
 
-def get_object_classes(query=''):
-    """Get all objectClass definitions from the schema."""
+CLASS_ATTRIBUTES = [
+    'cn', 'lDAPDisplayName', 'adminDescription',
+    'objectClassCategory', 'subClassOf',
+    'mustContain', 'mayContain',
+    'systemMustContain', 'systemMayContain',
+]
+
+
+def _class_from_entry(entry):
+    cat = int(_safe(entry, 'objectClassCategory') or 0)
+    return {
+        'cn': str(_safe(entry, 'cn') or ''),
+        'ldap_name': str(_safe(entry, 'lDAPDisplayName') or ''),
+        'description': str(_safe(entry, 'adminDescription') or ''),
+        'category': CATEGORY_MAP.get(cat, f'Unknown ({cat})'),
+        'parent': str(_safe(entry, 'subClassOf') or ''),
+        'must_contain': _safe_list(entry, 'mustContain') + _safe_list(entry, 'systemMustContain'),
+        'may_contain': _safe_list(entry, 'mayContain') + _safe_list(entry, 'systemMayContain'),
+    }
+
+
+def get_object_classes(query='', include_sd=False):
+    """Get all objectClass definitions from the schema.
+
+    defaultSecurityDescriptor is the largest value on each class and is only
+    fetched when include_sd is set; the list view doesn't display it.
+    """
     conn = None
     try:
-        conn = get_connection()
+        conn = get_connection(client_strategy=RESTARTABLE)
         schema_dn = _get_schema_dn(conn)
 
         if query:
@@ -49,45 +92,17 @@ def get_object_classes(query=''):
         else:
             ldap_filter = '(objectClass=classSchema)'
 
-        conn.search(
-            schema_dn, ldap_filter, search_scope=SUBTREE,
-            attributes=[
-                'cn', 'lDAPDisplayName', 'adminDescription',
-                'objectClassCategory', 'subClassOf',
-                'mustContain', 'mayContain',
-                'systemMustContain', 'systemMayContain',
-                'defaultSecurityDescriptor',
-            ],
-        )
+        attributes = CLASS_ATTRIBUTES
+        if include_sd:
+            attributes = attributes + ['defaultSecurityDescriptor']
+        conn.search(schema_dn, ldap_filter, search_scope=SUBTREE, attributes=attributes)
 
-        category_map = {0: 'Abstract', 1: 'Structural', 2: 'Auxiliary'}
         classes = []
         for entry in conn.entries:
-            def _safe(attr, e=entry):
-                try:
-                    return e[attr].value
-                except Exception:
-                    return None
-
-            def _safe_list(attr, e=entry):
-                try:
-                    val = e[attr].value
-                    if isinstance(val, list):
-                        return val
-                    return [val] if val else []
-                except Exception:
-                    return []
-
-            cat = int(_safe('objectClassCategory') or 0)
-            classes.append({
-                'cn': str(_safe('cn') or ''),
-                'ldap_name': str(_safe('lDAPDisplayName') or ''),
-                'description': str(_safe('adminDescription') or ''),
-                'category': category_map.get(cat, f'Unknown ({cat})'),
-                'parent': str(_safe('subClassOf') or ''),
-                'must_contain': _safe_list('mustContain') + _safe_list('systemMustContain'),
-                'may_contain': _safe_list('mayContain') + _safe_list('systemMayContain'),
-            })
+            cls = _class_from_entry(entry)
+            if include_sd:
+                cls['default_sd'] = str(_safe(entry, 'defaultSecurityDescriptor') or '')
+            classes.append(cls)
 
         classes.sort(key=lambda c: c['ldap_name'].lower())
         return True, classes
@@ -98,11 +113,39 @@ def get_object_classes(query=''):
             conn.unbind()
 
 
+def get_object_class_detail(ldap_name):
+    """Get a single objectClass definition, including its default security descriptor."""
+    conn = None
+    try:
+        conn = get_connection()
+        schema_dn = _get_schema_dn(conn)
+
+        # The schema container is flat and lDAPDisplayName is indexed
+        conn.search(
+            schema_dn,
+            f'(&(objectClass=classSchema)(lDAPDisplayName={escape_filter_chars(ldap_name)}))',
+            search_scope=LEVEL,
+            attributes=CLASS_ATTRIBUTES + ['defaultSecurityDescriptor'],
+        )
+        if not conn.entries:
+            return False, 'Object class not found'
+
+        entry = conn.entries[0]
+        cls = _class_from_entry(entry)
+        cls['default_sd'] = str(_safe(entry, 'defaultSecurityDescriptor') or '')
+        return True, cls
+    except Exception as e:
+        return False, str(e)
+    finally:
+        if conn:
+            conn.unbind()
+
+
 def get_attribute_definitions(query=''):
     """Get attribute definitions from the schema."""
     conn = None
     try:
-        conn = get_connection()
+        conn = get_connection(client_strategy=RESTARTABLE)
         schema_dn = _get_schema_dn(conn)
 
         if query:
@@ -122,27 +165,21 @@ def get_attribute_definitions(query=''):
 
         attrs = []
         for entry in conn.entries:
-            def _safe(attr, e=entry):
-                try:
-                    return e[attr].value
-                except Exception:
-                    return None
-
-            syntax_oid = str(_safe('attributeSyntax') or '')
-            search_flags = int(_safe('searchFlags') or 0)
+            syntax_oid = str(_safe(entry, 'attributeSyntax') or '')
+            search_flags = int(_safe(entry, 'searchFlags') or 0)
 
             attrs.append({
-                'cn': str(_safe('cn') or ''),
-                'ldap_name': str(_safe('lDAPDisplayName') or ''),
-                'description': str(_safe('adminDescription') or ''),
+                'cn': str(_safe(entry, 'cn') or ''),
+                'ldap_name': str(_safe(entry, 'lDAPDisplayName') or ''),
+                'description': str(_safe(entry, 'adminDescription') or ''),
                 'syntax': SYNTAX_MAP.get(syntax_oid, syntax_oid),
                 'syntax_oid': syntax_oid,
-                'single_valued': bool(_safe('isSingleValued')),
+                'single_valued': bool(_safe(entry, 'isSingleValued')),
                 'indexed': bool(search_flags & 1),
-                'gc_replicated': bool(_safe('isMemberOfPartialAttributeSet')),
-                'system_only': bool(_safe('systemOnly')),
-                'range_lower': _safe('rangeLower'),
-                'range_upper': _safe('rangeUpper'),
+                'gc_replicated': bool(_safe(entry, 'isMemberOfPartialAttributeSet')),
+                'system_only': bool(_safe(entry, 'systemOnly')),
+                'range_lower': _safe(entry, 'rangeLower'),
+                'range_upper': _safe(entry, 'rangeUpper'),
             })
 
         attrs.sort(key=lambda a: a['ldap_name'].lower())
@@ -5,85 +5,160 @@ from flask import current_app
 
 from .ad_connection import get_connection
 
+# Only the first MEMBER_COUNT_CAP member values are transferred per group;
+# larger groups are reported as e.g. "100+" rather than enumerated in full.
+MEMBER_COUNT_CAP = 100
 
-def global_search(query):
-    """Search across users, groups, computers, and OUs simultaneously."""
+# Queries shorter than this return nothing; unless the search is exhaustive,
+# queries shorter than SUBSTRING_MIN_LENGTH only match on name prefixes.
+MIN_QUERY_LENGTH = 2
+SUBSTRING_MIN_LENGTH = 5
+
+# Seconds the DC may spend on each of the per-type searches
+SEARCH_TIME_LIMIT = 5
+
+# RFC 4515 filter escaping, one character at a time in a single pass
+_FILTER_ESCAPE = str.maketrans({
+    '\\': r'\5c',
+    '(': r'\28',
+    ')': r'\29',
+    '*': r'\2a',
+    '\x00': r'\00',
+})
+
+
+def _member_count(entry):
+    """Count members from a ranged 'member;range=0-N' attribute.
+
+    AD answers with 'member;range=0-*' when the whole value set fit in the
+    requested range, otherwise with the range actually returned.
+    """
+    for attr, values in entry.entry_attributes_as_dict.items():
+        if attr.lower().startswith('member;range='):
+            if attr.endswith('*'):
+                return len(values)
+            return f'{len(values)}+'
+    return 0
+
+
+def global_search(query, exhaustive=False):
+    """Search across users, groups, computers, and OUs simultaneously.
+
+    Users and computers are matched with Ambiguous Name Resolution (ANR),
+    which uses AD's built-in multi-attribute index but only matches on
+    prefixes. Pass exhaustive=True to fall back to the slower substring
+    search across all the displayed attributes.
+
+    Queries under MIN_QUERY_LENGTH characters return no results, and
+    non-exhaustive queries under SUBSTRING_MIN_LENGTH only match name
+    prefixes, so a single keystroke never triggers leading-wildcard scans
+    on the DC.
+    """
     cfg = current_app.config
+    results = {'users': [], 'groups': [], 'computers': [], 'ous': []}
+    query = query.strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return True, results, 0
+
     conn = None
     try:
         conn = get_connection()
-        escaped_q = query.replace('(', '\\28').replace(')', '\\29').replace('*', '\\2a').replace('\\', '\\5c')
-        results = {'users': [], 'groups': [], 'computers': [], 'ous': []}
+        escaped_q = query.translate(_FILTER_ESCAPE)
+        # Exhaustive searches always use substrings, whatever the length
+        substring = exhaustive or len(query) >= SUBSTRING_MIN_LENGTH
+        pattern = f'*{escaped_q}*' if substring else f'{escaped_q}*'
 
         # Search users
-        user_filter = (
-            f'(&(objectClass=user)(objectCategory=person)'
-            f'(|(cn=*{escaped_q}*)(sAMAccountName=*{escaped_q}*)'
-            f'(mail=*{escaped_q}*)(displayName=*{escaped_q}*)'
-            f'(department=*{escaped_q}*)))'
-        )
+        if exhaustive:
+            user_filter = (
+                f'(&(objectClass=user)(objectCategory=person)'
+                f'(|(cn={pattern})(sAMAccountName={pattern})'
+                f'(mail={pattern})(displayName={pattern})'
+                f'(department={pattern})))'
+            )
+        else:
+            user_filter = f'(&(objectClass=user)(objectCategory=person)(anr={escaped_q}))'
         conn.search(cfg['BASE_DN'], user_filter, search_scope=SUBTREE,
                      attributes=['cn', 'sAMAccountName', 'displayName', 'mail',
-                                 'department', 'userAccountControl', 'distinguishedName'],
-                     size_limit=25)
+                                 'department', 'userAccountControl'],
+                     size_limit=25, time_limit=SEARCH_TIME_LIMIT)
         for entry in conn.entries:
-            uac = int(entry.userAccountControl.value) if entry.userAccountControl.value else 512
-            status = 'disabled' if uac & 2 else 'enabled'
+            uac = entry.userAccountControl.value
+            display_name = entry.displayName.value
+            mail = entry.mail.value
+            department = entry.department.value
             results['users'].append({
-                'cn': str(entry.cn),
-                'sam': str(entry.sAMAccountName),
-                'display_name': str(entry.displayName) if entry.displayName.value else '',
-                'mail': str(entry.mail) if entry.mail.value else '',
-                'department': str(entry.department) if entry.department.value else '',
-                'status': status,
+                'cn': str(entry.cn.value),
+                'sam': str(entry.sAMAccountName.value),
+                'display_name': str(display_name) if display_name else '',
+                'mail': str(mail) if mail else '',
+                'department': str(department) if department else '',
+                'status': 'disabled' if int(uac or 512) & 2 else 'enabled',
                 'dn': str(entry.entry_dn),
             })
 
         # Search groups
-        group_filter = f'(&(objectClass=group)(|(cn=*{escaped_q}*)(description=*{escaped_q}*)))'
-        conn.search(cfg['BASE_DN'], group_filter, search_scope=SUBTREE,
-                     attributes=['cn', 'description', 'groupType', 'member', 'distinguishedName'],
-                     size_limit=25)
+        # description is not indexed, so only search it for longer queries
+        if substring:
+            group_filter = f'(&(objectClass=group)(|(cn={pattern})(description={pattern})))'
+        else:
+            group_filter = f'(&(objectClass=group)(cn={pattern}))'
+        # Disable auto_range so ldap3 doesn't page through the rest of the
+        # member list; an exact count for big groups needs the group detail page
+        conn.auto_range = False
+        try:
+            conn.search(cfg['BASE_DN'], group_filter, search_scope=SUBTREE,
+                         attributes=['cn', 'description',
+                                     f'member;range=0-{MEMBER_COUNT_CAP - 1}'],
+                         size_limit=25, time_limit=SEARCH_TIME_LIMIT)
+        finally:
+            conn.auto_range = True
         for entry in conn.entries:
-            member_count = len(entry.member.values) if entry.member.value else 0
+            description = entry.description.value
             results['groups'].append({
-                'cn': str(entry.cn),
-                'description': str(entry.description) if entry.description.value else '',
-                'member_count': member_count,
+                'cn': str(entry.cn.value),
+                'description': str(description) if description else '',
+                'member_count': _member_count(entry),
                 'dn': str(entry.entry_dn),
             })
 
         # Search computers
-        comp_filter = f'(&(objectClass=computer)(|(cn=*{escaped_q}*)(sAMAccountName=*{escaped_q}*)))'
+        if exhaustive:
+            comp_filter = f'(&(objectClass=computer)(|(cn={pattern})(sAMAccountName={pattern})))'
+        else:
+            comp_filter = f'(&(objectClass=computer)(anr={escaped_q}))'
         conn.search(cfg['BASE_DN'], comp_filter, search_scope=SUBTREE,
                      attributes=['cn', 'sAMAccountName', 'operatingSystem',
-                                 'userAccountControl', 'distinguishedName'],
-                     size_limit=25)
+                                 'userAccountControl'],
+                     size_limit=25, time_limit=SEARCH_TIME_LIMIT)
         for entry in conn.entries:
-            uac = int(entry.userAccountControl.value) if entry.userAccountControl.value else 4096
-            status = 'disabled' if uac & 2 else 'enabled'
+            uac = entry.userAccountControl.value
             os_name = ''
             try:
-                os_name = str(entry.operatingSystem) if entry.operatingSystem.value else ''
+                os_name = str(entry.operatingSystem.value or '')
             except Exception:
                 pass
             results['computers'].append({
-                'cn': str(entry.cn),
-                'sam': str(entry.sAMAccountName),
+                'cn': str(entry.cn.value),
+                'sam': str(entry.sAMAccountName.value),
                 'os': os_name,
-                'status': status,
+                'status': 'disabled' if int(uac or 4096) & 2 else 'enabled',
                 'dn': str(entry.entry_dn),
             })
 
         # Search OUs
-        ou_filter = f'(&(objectClass=organizationalUnit)(|(ou=*{escaped_q}*)(description=*{escaped_q}*)))'
+        if substring:
+            ou_filter = f'(&(objectClass=organizationalUnit)(|(ou={pattern})(description={pattern})))'
+        else:
+            ou_filter = f'(&(objectClass=organizationalUnit)(ou={pattern}))'
         conn.search(cfg['BASE_DN'], ou_filter, search_scope=SUBTREE,
-                     attributes=['ou', 'description', 'distinguishedName'],
-                     size_limit=25)
+                     attributes=['ou', 'description'],
+                     size_limit=25, time_limit=SEARCH_TIME_LIMIT)
         for entry in conn.entries:
+            description = entry.description.value
             results['ous'].append({
-                'name': str(entry.ou),
-                'description': str(entry.description) if entry.description.value else '',
+                'name': str(entry.ou.value),
+                'description': str(description) if description else '',
                 'dn': str(entry.entry_dn),
             })
 
@@ -1,82 +1,82 @@
 """Service Account Manager - find and report on service accounts."""
 
 from datetime import datetime, timedelta, timezone
+from operator import itemgetter
 
 from ldap3 import SUBTREE
 from flask import current_app
 
-from .ad_connection import get_connection
-
-USER_FILTER = '(&(objectClass=user)(objectCategory=person))'
-
-
-def get_service_accounts():
-    """Find service accounts: password never expires, non-interactive flags, SPN set, etc."""
+from .ad_connection import pooled_connection
+
+# Users that look like service accounts: password never expires
+# (DONT_EXPIRE_PASSWORD, via the bitwise-AND matching rule), an SPN set,
+# or "svc"/"service" in the name or description. AD matches these string
+# attributes case-insensitively.
+SERVICE_ACCOUNT_FILTER = (
+    '(&(objectClass=user)(objectCategory=person)'
+    '(|(userAccountControl:1.2.840.113556.1.4.803:=65536)'
+    '(servicePrincipalName=*)'
+    '(sAMAccountName=svc*)(sAMAccountName=*service*)'
+    '(description=*service*)))'
+)
+
+# userAccountControl bits reported per service account
+UAC_FLAGS = (
+    (0x10000, 'pwd_never_expires'),     # DONT_EXPIRE_PASSWORD
+    (0x100000, 'not_delegated'),        # NOT_DELEGATED
+    (0x80000, 'trusted_for_deleg'),     # TRUSTED_FOR_DELEGATION
+    (0x1000000, 'constrained_deleg'),   # TRUSTED_TO_AUTH_FOR_DELEGATION
+    (0x2, 'disabled'),                  # ACCOUNTDISABLE
+    (0x40, 'cant_change_pwd'),          # PASSWD_CANT_CHANGE
+)
+
+
+def iter_service_accounts():
+    """Yield service accounts one at a time as result pages arrive from AD.
+
+    LDAP errors propagate to the caller; get_service_accounts wraps this in
+    the usual (success, data) result.
+    """
     cfg = current_app.config
-    conn = None
-    try:
-        conn = get_connection()
-
-        # Get all user accounts with relevant attributes
-        conn.search(
-            cfg['BASE_DN'], USER_FILTER, search_scope=SUBTREE,
+    with pooled_connection() as conn:
+        # Stream candidate service accounts a page at a time so only one
+        # page of raw results is held in memory
+        entries = conn.extend.standard.paged_search(
+            cfg['BASE_DN'], SERVICE_ACCOUNT_FILTER, search_scope=SUBTREE,
             attributes=[
                 'cn', 'sAMAccountName', 'displayName', 'userAccountControl',
-                'servicePrincipalName', 'pwdLastSet', 'lastLogon',
+                'servicePrincipalName', 'pwdLastSet',
                 'description', 'memberOf', 'whenCreated',
-                'distinguishedName',
             ],
             paged_size=1000,
+            generator=True,
         )
 
         now = datetime.now(timezone.utc)
-        accounts = []
 
-        for entry in conn.entries:
-            uac = int(entry.userAccountControl.value) if entry.userAccountControl.value else 512
-
-            # Flags
-            pwd_never_expires = bool(uac & 0x10000)     # DONT_EXPIRE_PASSWORD
-            not_delegated = bool(uac & 0x100000)         # NOT_DELEGATED
-            trusted_for_deleg = bool(uac & 0x80000)      # TRUSTED_FOR_DELEGATION
-            constrained_deleg = bool(uac & 0x1000000)    # TRUSTED_TO_AUTH_FOR_DELEGATION
-            disabled = bool(uac & 0x2)
-            cant_change_pwd = bool(uac & 0x40)           # PASSWD_CANT_CHANGE
+        for entry in entries:
+            if entry['type'] != 'searchResEntry':
+                continue
+            attrs = entry['attributes']
+            uac = int(attrs.get('userAccountControl') or 512)
 
-            # Get SPNs
-            spns = []
-            try:
-                if entry.servicePrincipalName.value:
-                    spns = [str(v) for v in entry.servicePrincipalName.values]
-            except Exception:
-                pass
+            flags = {name: bool(uac & bit) for bit, name in UAC_FLAGS}
+            pwd_never_expires = flags['pwd_never_expires']
+            disabled = flags['disabled']
 
+            spns = [str(v) for v in attrs.get('servicePrincipalName') or []]
             has_spn = len(spns) > 0
 
-            # Determine if this looks like a service account
-            sam = str(entry.sAMAccountName)
-            description = ''
-            try:
-                description = str(entry.description) if entry.description.value else ''
-            except Exception:
-                pass
-
-            is_service = (
-                pwd_never_expires or
-                has_spn or
-                sam.startswith('svc') or sam.startswith('SVC') or
-                sam.startswith('svc_') or sam.startswith('svc-') or
-                'service' in description.lower() or
-                'service' in sam.lower()
-            )
-
-            if not is_service:
-                continue
+            sam = str(attrs.get('sAMAccountName') or '')
+            # description is multi-valued in the schema, so it arrives as a list
+            description = attrs.get('description') or ''
+            if isinstance(description, list):
+                description = str(description[0]) if description else ''
 
             # Password age
             pwd_age_days = None
             try:
-                pwd_last_set = entry.pwdLastSet.value
+                pwd_last_set = attrs.get('pwdLastSet')
                 if pwd_last_set and str(pwd_last_set) not in ('0', '1601-01-01 00:00:00+00:00'):
                     if hasattr(pwd_last_set, 'replace'):
                         pdt = pwd_last_set if pwd_last_set.tzinfo else pwd_last_set.replace(tzinfo=timezone.utc)
@@ -92,41 +92,40 @@ def get_service_accounts():
                 risks.append('Password Never Expires')
             if pwd_age_days and pwd_age_days > 365:
                 risks.append(f'Password {pwd_age_days}d old')
-            if trusted_for_deleg:
+            if flags['trusted_for_deleg']:
                 risks.append('Unconstrained Delegation')
-            if constrained_deleg:
+            if flags['constrained_deleg']:
                 risks.append('Constrained Delegation')
 
-            groups = []
-            try:
-                if entry.memberOf.value:
-                    groups = [str(g) for g in entry.memberOf.values]
-            except Exception:
-                pass
+            risk_count = len(risks)
+            groups = attrs.get('memberOf') or []
 
-            accounts.append({
-                'cn': str(entry.cn),
+            yield {
+                'cn': str(attrs.get('cn') or ''),
                 'sam': sam,
-                'display_name': str(entry.displayName) if entry.displayName.value else '',
+                'display_name': str(attrs.get('displayName') or ''),
                 'description': description,
-                'dn': str(entry.entry_dn),
+                'dn': entry['dn'],
                 'status': 'disabled' if disabled else 'enabled',
                 'pwd_never_expires': pwd_never_expires,
                 'has_spn': has_spn,
                 'spns': spns,
                 'pwd_age_days': pwd_age_days,
-                'trusted_for_delegation': trusted_for_deleg,
-                'constrained_delegation': constrained_deleg,
+                'trusted_for_delegation': flags['trusted_for_deleg'],
+                'constrained_delegation': flags['constrained_deleg'],
                 'risks': risks,
-                'risk_level': 'high' if len(risks) >= 3 else 'medium' if len(risks) >= 1 else 'low',
+                'risk_count': risk_count,
+                'risk_level': 'high' if risk_count >= 3 else 'medium' if risk_count >= 1 else 'low',
                 'group_count': len(groups),
-                'created': str(entry.whenCreated) if entry.whenCreated.value else '',
-            })
+                'created': str(attrs.get('whenCreated') or ''),
+            }
+
 
-        accounts.sort(key=lambda a: len(a['risks']), reverse=True)
+def get_service_accounts():
+    """Find service accounts: password never expires, non-interactive flags, SPN set, etc."""
+    try:
+        accounts = list(iter_service_accounts())
+        accounts.sort(key=itemgetter('risk_count'), reverse=True)
         return True, accounts
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
@@ -1,164 +1,172 @@
+import time
+
 from ldap3 import SUBTREE, BASE
 from flask import current_app
 
-from .ad_connection import get_connection
+from .ad_connection import pooled_connection
+from .ad_naming import get_naming_contexts
 
+# Site topology rarely changes; reuse results for this many seconds
+TOPOLOGY_CACHE_TTL = 300
 
-def _get_config_dn(conn):
-    """Get the Configuration naming context from RootDSE."""
+_topology_cache = {}
+
+
+def _cache_get(name):
+    key = (current_app.config['AD_SERVER_IP'], name)
+    hit = _topology_cache.get(key)
+    if hit and time.monotonic() - hit[0] < TOPOLOGY_CACHE_TTL:
+        return hit[1]
+    return None
+
+
+def _cache_put(name, value):
+    key = (current_app.config['AD_SERVER_IP'], name)
+    _topology_cache[key] = (time.monotonic(), value)
+
+
+def clear_topology_cache():
+    """Drop cached sites and site links so the next call re-reads AD."""
+    _topology_cache.clear()
+
+
+def _safe(entry, attr):
+    try:
+        return entry[attr].value
+    except Exception:
+        return None
+
+
+def _safe_list(entry, attr):
     try:
-        info = conn.server.info
-        return str(info.other.get('configurationNamingContext', [None])[0])
+        val = entry[attr].value
+        if isinstance(val, list):
+            return val
+        return [val] if val else []
     except Exception:
-        # Fallback: derive from BASE_DN
-        base = current_app.config['BASE_DN']
-        return f"CN=Configuration,{base}"
+        return []
+
+
+def _get_config_dn(conn):
+    """Get the Configuration naming context from RootDSE."""
+    config_dn = get_naming_contexts(conn)['configurationNamingContext']
+    if not config_dn:
+        raise ValueError('Cannot determine configuration naming context')
+    return config_dn
 
 
 def get_sites():
     """Get all AD sites with their subnets and servers."""
-    conn = None
+    cached = _cache_get('sites')
+    if cached is not None:
+        return True, cached
     try:
-        conn = get_connection()
-        config_dn = _get_config_dn(conn)
-        sites_dn = f"CN=Sites,{config_dn}"
-
-        # Get all sites
-        conn.search(
-            sites_dn,
-            '(objectClass=site)',
-            search_scope=SUBTREE,
-            attributes=['cn', 'description', 'location', 'whenCreated', 'whenChanged'],
-        )
-        sites = []
-        for entry in conn.entries:
-            def _safe(attr, e=entry):
-                try:
-                    return e[attr].value
-                except Exception:
-                    return None
-
-            sites.append({
-                'cn': str(_safe('cn') or ''),
-                'dn': str(entry.entry_dn),
-                'description': str(_safe('description') or ''),
-                'location': str(_safe('location') or ''),
-                'when_created': str(_safe('whenCreated') or ''),
-                'subnets': [],
-                'servers': [],
-            })
-
-        # Get all subnets
-        subnets_dn = f"CN=Subnets,CN=Sites,{config_dn}"
-        conn.search(
-            subnets_dn,
-            '(objectClass=subnet)',
-            search_scope=SUBTREE,
-            attributes=['cn', 'description', 'siteObject', 'location'],
-        )
-        for entry in conn.entries:
-            def _safe(attr, e=entry):
-                try:
-                    return e[attr].value
-                except Exception:
-                    return None
-
-            site_obj = str(_safe('siteObject') or '')
-            subnet = {
-                'cn': str(_safe('cn') or ''),
-                'description': str(_safe('description') or ''),
-                'location': str(_safe('location') or ''),
-                'site_dn': site_obj,
-            }
-            # Associate subnet with its site
-            for site in sites:
-                if site['dn'].lower() == site_obj.lower():
+        with pooled_connection() as conn:
+            config_dn = _get_config_dn(conn)
+            sites_dn = f"CN=Sites,{config_dn}"
+
+            # Get all sites
+            conn.search(
+                sites_dn,
+                '(objectClass=site)',
+                search_scope=SUBTREE,
+                attributes=['cn', 'description', 'location', 'whenCreated', 'whenChanged'],
+            )
+            sites = []
+            for entry in conn.entries:
+                sites.append({
+                    'cn': str(_safe(entry, 'cn') or ''),
+                    'dn': str(entry.entry_dn),
+                    'description': str(_safe(entry, 'description') or ''),
+                    'location': str(_safe(entry, 'location') or ''),
+                    'when_created': str(_safe(entry, 'whenCreated') or ''),
+                    'subnets': [],
+                    'servers': [],
+                })
+
+            site_by_dn = {site['dn'].lower(): site for site in sites}
+
+            # Get all subnets
+            subnets_dn = f"CN=Subnets,CN=Sites,{config_dn}"
+            conn.search(
+                subnets_dn,
+                '(objectClass=subnet)',
+                search_scope=SUBTREE,
+                attributes=['cn', 'description', 'siteObject', 'location'],
+            )
+            for entry in conn.entries:
+                site_obj = str(_safe(entry, 'siteObject') or '')
+                subnet = {
+                    'cn': str(_safe(entry, 'cn') or ''),
+                    'description': str(_safe(entry, 'description') or ''),
+                    'location': str(_safe(entry, 'location') or ''),
+                    'site_dn': site_obj,
+                }
+                # Associate subnet with its site
+                site = site_by_dn.get(site_obj.lower())
+                if site:
                     site['subnets'].append(subnet)
-                    break
-
-        # Get servers in each site
-        for site in sites:
-            servers_dn = f"CN=Servers,{site['dn']}"
-            try:
-                conn.search(
-                    servers_dn,
-                    '(objectClass=server)',
-                    search_scope=SUBTREE,
-                    attributes=['cn', 'dNSHostName'],
-                )
-                for entry in conn.entries:
-                    def _safe(attr, e=entry):
-                        try:
-                            return e[attr].value
-                        except Exception:
-                            return None
+
+            # Get servers for every site in one search; a server lives at
+            # CN=<server>,CN=Servers,<site DN>
+            conn.search(
+                sites_dn,
+                '(objectClass=server)',
+                search_scope=SUBTREE,
+                attributes=['cn', 'dNSHostName'],
+            )
+            for entry in conn.entries:
+                site_dn = str(entry.entry_dn).split(',', 2)[-1]
+                site = site_by_dn.get(site_dn.lower())
+                if site:
                     site['servers'].append({
-                        'cn': str(_safe('cn') or ''),
-                        'dns_host': str(_safe('dNSHostName') or ''),
+                        'cn': str(_safe(entry, 'cn') or ''),
+                        'dns_host': str(_safe(entry, 'dNSHostName') or ''),
                     })
-            except Exception:
-                pass
 
-        return True, sites
+            _cache_put('sites', sites)
+            return True, sites
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
 
 
 def get_site_links():
     """Get all AD site links."""
-    conn = None
+    cached = _cache_get('site_links')
+    if cached is not None:
+        return True, cached
     try:
-        conn = get_connection()
-        config_dn = _get_config_dn(conn)
-        links_dn = f"CN=IP,CN=Inter-Site Transports,CN=Sites,{config_dn}"
-
-        conn.search(
-            links_dn,
-            '(objectClass=siteLink)',
-            search_scope=SUBTREE,
-            attributes=['cn', 'cost', 'replInterval', 'siteList', 'description', 'options'],
-        )
-        links = []
-        for entry in conn.entries:
-            def _safe(attr, e=entry):
-                try:
-                    return e[attr].value
-                except Exception:
-                    return None
-
-            def _safe_list(attr, e=entry):
-                try:
-                    val = e[attr].value
-                    if isinstance(val, list):
-                        return val
-                    return [val] if val else []
-                except Exception:
-                    return []
-
-            site_list = _safe_list('siteList')
-            # Extract site names from DNs
-            site_names = []
-            for s in site_list:
-                parts = str(s).split(',')
-                if parts:
-                    name = parts[0].replace('CN=', '')
-                    site_names.append(name)
-
-            links.append({
-                'cn': str(_safe('cn') or ''),
-                'cost': int(_safe('cost') or 100),
-                'repl_interval': int(_safe('replInterval') or 180),
-                'description': str(_safe('description') or ''),
-                'sites': site_names,
-                'site_count': len(site_names),
-            })
-
-        return True, links
+        with pooled_connection() as conn:
+            config_dn = _get_config_dn(conn)
+            links_dn = f"CN=IP,CN=Inter-Site Transports,CN=Sites,{config_dn}"
+
+            conn.search(
+                links_dn,
+                '(objectClass=siteLink)',
+                search_scope=SUBTREE,
+                attributes=['cn', 'cost', 'replInterval', 'siteList', 'description', 'options'],
+            )
+            links = []
+            for entry in conn.entries:
+                site_list = _safe_list(entry, 'siteList')
+                # Extract site names from DNs
+                site_names = []
+                for s in site_list:
+                    parts = str(s).split(',')
+                    if parts:
+                        name = parts[0].replace('CN=', '')
+                        site_names.append(name)
+
+                links.append({
+                    'cn': str(_safe(entry, 'cn') or ''),
+                    'cost': int(_safe(entry, 'cost') or 100),
+                    'repl_interval': int(_safe(entry, 'replInterval') or 180),
+                    'description': str(_safe(entry, 'description') or ''),
+                    'sites': site_names,
+                    'site_count': len(site_names),
+                })
+
+            _cache_put('site_links', links)
+            return True, links
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
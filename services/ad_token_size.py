@@ -4,11 +4,12 @@ Estimates the size of a user's Kerberos ticket based on group memberships.
 Based on Microsoft's documentation for token size calculation.
 """
 
-from ldap3 import SUBTREE
-from ldap3.utils.dn import escape_rdn
+from ldap3 import SUBTREE, BASE
+from ldap3.protocol.formatters.formatters import format_sid
+from ldap3.utils.conv import escape_bytes, escape_filter_chars
 from flask import current_app
 
-from .ad_connection import get_connection
+from .ad_connection import pooled_connection
 
 # Token size constants (bytes)
 TOKEN_BASE_SIZE = 1200  # Base ticket overhead
@@ -20,106 +21,131 @@ TOKEN_WARNING = 12000   # HTTP default MaxTokenSize issues start here
 TOKEN_CRITICAL = 48000  # Kerberos MaxTokenSize default (Windows 2012+)
 TOKEN_MAX_LEGACY = 12000  # Older Windows default MaxTokenSize
 
+# groupType value -> (label, stats counter); security and distribution variants
+GROUP_TYPE_MAP = {
+    -2147483644: ('Domain Local', 'domain_local_count'),
+    4: ('Domain Local', 'domain_local_count'),
+    -2147483646: ('Global', 'global_count'),
+    2: ('Global', 'global_count'),
+    -2147483640: ('Universal', 'universal_count'),
+    8: ('Universal', 'universal_count'),
+}
+
+# Group SIDs resolved per objectSid lookup search
+SID_LOOKUP_BATCH = 200
+
 
 def estimate_token_size(sam_account_name):
     """Estimate Kerberos token size for a user."""
     cfg = current_app.config
-    conn = None
     try:
-        conn = get_connection()
-
-        # Find the user
-        user_filter = (
-            f'(&(objectClass=user)(objectCategory=person)'
-            f'(sAMAccountName={escape_rdn(sam_account_name)}))'
-        )
-        conn.search(cfg['BASE_DN'], user_filter, search_scope=SUBTREE,
-                     attributes=['cn', 'sAMAccountName', 'distinguishedName', 'memberOf'])
-        if not conn.entries:
-            return False, 'User not found'
-
-        user_entry = conn.entries[0]
-        user_dn = str(user_entry.entry_dn)
-
-        # Get direct group memberships
-        direct_groups = []
-        if user_entry.memberOf and user_entry.memberOf.values:
-            direct_groups = [str(g) for g in user_entry.memberOf.values]
-
-        # Get nested (transitive) group memberships
-        nested_filter = (
-            f'(&(objectClass=group)'
-            f'(member:1.2.840.113556.1.4.1941:={user_dn}))'
-        )
-        conn.search(cfg['BASE_DN'], nested_filter, search_scope=SUBTREE,
-                     attributes=['cn', 'sAMAccountName', 'groupType', 'distinguishedName'])
-
-        all_groups = []
-        domain_local_count = 0
-        global_count = 0
-        universal_count = 0
-
-        for entry in conn.entries:
-            gt = int(entry.groupType.value) if entry.groupType.value else 0
-            group_info = {
-                'dn': str(entry.entry_dn),
-                'cn': str(entry.cn) if entry.cn else '',
-                'sam': str(entry.sAMAccountName) if entry.sAMAccountName else '',
-                'group_type': gt,
-                'direct': str(entry.entry_dn) in direct_groups,
-            }
-
-            # Classify group type
-            if gt in (-2147483644, 4):  # Domain local
-                group_info['type_label'] = 'Domain Local'
-                domain_local_count += 1
-            elif gt in (-2147483646, 2):  # Global
-                group_info['type_label'] = 'Global'
-                global_count += 1
-            elif gt in (-2147483640, 8):  # Universal
-                group_info['type_label'] = 'Universal'
-                universal_count += 1
+        with pooled_connection() as conn:
+            # Find the user
+            user_filter = (
+                f'(&(objectClass=user)(objectCategory=person)'
+                f'(sAMAccountName={escape_filter_chars(sam_account_name)}))'
+            )
+            conn.search(cfg['BASE_DN'], user_filter, search_scope=SUBTREE,
+                         attributes=['cn', 'sAMAccountName', 'distinguishedName', 'memberOf'])
+            if not conn.entries:
+                return False, 'User not found'
+
+            user_entry = conn.entries[0]
+            user_dn = str(user_entry.entry_dn)
+
+            # Get direct group memberships
+            direct_groups = []
+            if user_entry.memberOf and user_entry.memberOf.values:
+                direct_groups = [str(g) for g in user_entry.memberOf.values]
+            # DNs compare case-insensitively
+            direct_set = {dn.lower() for dn in direct_groups}
+
+            # tokenGroups is constructed by the DC from the user's full
+            # transitive membership in one base-scope read, instead of a
+            # LDAP_MATCHING_RULE_IN_CHAIN walk over every group
+            conn.search(user_dn, '(objectClass=*)', search_scope=BASE,
+                         attributes=['tokenGroups'])
+            sids = []
+            if conn.response:
+                sids = conn.response[0]['raw_attributes'].get('tokenGroups') or []
+
+            # Resolve the SIDs to groups, a batch of OR'd objectSid clauses at a time
+            group_entries = []
+            for i in range(0, len(sids), SID_LOOKUP_BATCH):
+                sid_filter = '(|' + ''.join(
+                    f'(objectSid={escape_bytes(sid)})'
+                    for sid in sids[i:i + SID_LOOKUP_BATCH]) + ')'
+                conn.search(cfg['BASE_DN'], sid_filter, search_scope=SUBTREE,
+                             attributes=['cn', 'sAMAccountName', 'groupType', 'objectSid'])
+                group_entries.extend(conn.entries)
+
+            all_groups = []
+            counts = {'domain_local_count': 0, 'global_count': 0, 'universal_count': 0}
+            resolved = set()
+
+            for entry in group_entries:
+                resolved.add(entry.objectSid.raw_values[0])
+                gt = int(entry.groupType.value) if entry.groupType.value else 0
+                group_dn = str(entry.entry_dn)
+                group_info = {
+                    'dn': group_dn,
+                    'cn': str(entry.cn) if entry.cn else '',
+                    'sam': str(entry.sAMAccountName) if entry.sAMAccountName else '',
+                    'group_type': gt,
+                    'direct': group_dn.lower() in direct_set,
+                }
+
+                label, counter = GROUP_TYPE_MAP.get(gt, ('Unknown', None))
+                group_info['type_label'] = label
+                if counter:
+                    counts[counter] += 1
+
+                all_groups.append(group_info)
+
+            # SIDs outside this domain (e.g. from a trusted forest) still
+            # count towards the token even though they can't be looked up here
+            for sid in sids:
+                if sid not in resolved:
+                    all_groups.append({
+                        'dn': '',
+                        'cn': format_sid(sid),
+                        'sam': '',
+                        'group_type': 0,
+                        'direct': False,
+                        'type_label': 'Unknown',
+                    })
+
+            # Calculate estimated token size
+            total_groups = len(all_groups)
+            estimated_size = TOKEN_BASE_SIZE + (total_groups * SID_SIZE) + (counts['domain_local_count'] * DOMAIN_LOCAL_EXTRA)
+
+            # Determine severity
+            if estimated_size >= TOKEN_CRITICAL:
+                severity = 'critical'
+            elif estimated_size >= TOKEN_WARNING:
+                severity = 'warning'
             else:
-                group_info['type_label'] = 'Unknown'
-
-            all_groups.append(group_info)
-
-        # Calculate estimated token size
-        total_groups = len(all_groups)
-        estimated_size = TOKEN_BASE_SIZE + (total_groups * SID_SIZE) + (domain_local_count * DOMAIN_LOCAL_EXTRA)
-
-        # Determine severity
-        if estimated_size >= TOKEN_CRITICAL:
-            severity = 'critical'
-        elif estimated_size >= TOKEN_WARNING:
-            severity = 'warning'
-        else:
-            severity = 'ok'
-
-        return True, {
-            'user': {
-                'cn': str(user_entry.cn) if user_entry.cn else '',
-                'sam': sam_account_name,
-                'dn': user_dn,
-            },
-            'groups': all_groups,
-            'stats': {
-                'total_groups': total_groups,
-                'direct_groups': len(direct_groups),
-                'nested_groups': total_groups - len(direct_groups),
-                'global_count': global_count,
-                'universal_count': universal_count,
-                'domain_local_count': domain_local_count,
-            },
-            'token': {
-                'estimated_size': estimated_size,
-                'severity': severity,
-                'warning_threshold': TOKEN_WARNING,
-                'critical_threshold': TOKEN_CRITICAL,
-            },
-        }
+                severity = 'ok'
+
+            return True, {
+                'user': {
+                    'cn': str(user_entry.cn) if user_entry.cn else '',
+                    'sam': sam_account_name,
+                    'dn': user_dn,
+                },
+                'groups': all_groups,
+                'stats': {
+                    'total_groups': total_groups,
+                    'direct_groups': len(direct_groups),
+                    'nested_groups': total_groups - len(direct_groups),
+                    **counts,
+                },
+                'token': {
+                    'estimated_size': estimated_size,
+                    'severity': severity,
+                    'warning_threshold': TOKEN_WARNING,
+                    'critical_threshold': TOKEN_CRITICAL,
+                },
+            }
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
@@ -1,12 +1,14 @@
 import csv
 import io
-from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from datetime import datetime, timezone
 
-from ldap3 import MODIFY_REPLACE, SUBTREE
+from ldap3 import MODIFY_REPLACE, SUBTREE, BASE
+from ldap3.utils.conv import escape_filter_chars
 from ldap3.utils.dn import escape_rdn
 from flask import current_app
 
-from .ad_connection import get_connection
+from .ad_connection import pooled_connection
 
 EXTENSION_ATTRS = [f'extensionAttribute{i}' for i in range(1, 16)]
 
@@ -18,14 +20,33 @@ USER_ATTRIBUTES = [
     'whenCreated', 'whenChanged', 'distinguishedName', 'accountExpires',
 ]
 
+# Only what the search_users list view shows; memberOf in particular can be
+# large and isn't needed there
+USER_LIST_ATTRIBUTES = [
+    'cn', 'sAMAccountName', 'userPrincipalName', 'givenName', 'sn',
+    'displayName', 'mail', 'telephoneNumber', 'department', 'title',
+    'userAccountControl', 'lockoutTime', 'lastLogon', 'whenCreated',
+]
+
 # Full attribute list including extension attrs (used only in get_user detail)
 USER_DETAIL_ATTRIBUTES = USER_ATTRIBUTES + EXTENSION_ATTRS
 
+# objectCategory=person is the indexed clause; objectClass=user keeps contacts
+# (also objectCategory=person) out of the results
 USER_FILTER = '(&(objectClass=user)(objectCategory=person))'
 
 # Windows FILETIME epoch (Jan 1 1601)
 _FILETIME_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
 _NEVER_EXPIRES_VALUES = {0, 9223372036854775807}  # 0 and 0x7FFFFFFFFFFFFFFF
+# 100-ns intervals between the FILETIME and Unix epochs
+_FILETIME_UNIX_OFFSET = 116444736000000000
+
+
+@lru_cache(maxsize=1024)
+def _filetime_day(val):
+    # Many accounts share an expiry date, so the formatted day is cached
+    secs = (val - _FILETIME_UNIX_OFFSET) // 10_000_000
+    return datetime.fromtimestamp(secs, timezone.utc).strftime('%Y-%m-%d')
 
 
 def _filetime_to_date(filetime_val):
@@ -34,9 +55,8 @@ def _filetime_to_date(filetime_val):
         val = int(filetime_val)
         if val in _NEVER_EXPIRES_VALUES:
             return 'Never'
-        dt = _FILETIME_EPOCH + timedelta(microseconds=val // 10)
-        return dt.strftime('%Y-%m-%d')
-    except (ValueError, TypeError, OverflowError):
+        return _filetime_day(val)
+    except (ValueError, TypeError, OverflowError, OSError):
         return 'Never'
 
 
@@ -49,10 +69,9 @@ def _date_to_filetime(date_str):
     return int(delta.total_seconds() * 10_000_000)
 
 
-def _user_status(entry):
-    """Derive status string from userAccountControl and lockoutTime."""
-    uac = int(entry.userAccountControl.value) if entry.userAccountControl.value else 512
-    lockout = entry.lockoutTime.value if hasattr(entry, 'lockoutTime') and entry.lockoutTime.value else None
+def _user_status(uac, lockout):
+    """Derive status string from userAccountControl and lockoutTime values."""
+    uac = int(uac) if uac else 512
 
     if lockout and str(lockout) not in ('0', '1601-01-01 00:00:00+00:00'):
         return 'locked'
@@ -61,109 +80,120 @@ def _user_status(entry):
     return 'enabled'
 
 
+@lru_cache(maxsize=256)
+def _user_search_filter(query):
+    """Substring filter over cn, sAMAccountName and mail for search_users."""
+    q = escape_filter_chars(query)
+    return f'(&{USER_FILTER}(|(cn=*{q}*)(sAMAccountName=*{q}*)(mail=*{q}*)))'
+
+
+@lru_cache(maxsize=256)
+def _user_filter(sam_account_name):
+    """Equality filter for a single user by sAMAccountName."""
+    return f'(&{USER_FILTER}(sAMAccountName={escape_filter_chars(sam_account_name)}))'
+
+
 def search_users(query='*', ou=None):
     cfg = current_app.config
-    search_base = ou or cfg['BASE_DN']
+    search_base = ou or cfg.get('USER_SEARCH_BASE') or cfg['BASE_DN']
     if query and query != '*':
-        ldap_filter = f'(&{USER_FILTER}(|(cn=*{escape_rdn(query)}*)(sAMAccountName=*{escape_rdn(query)}*)(mail=*{escape_rdn(query)}*)))'
+        ldap_filter = _user_search_filter(query)
     else:
         ldap_filter = USER_FILTER
 
-    conn = None
     try:
-        conn = get_connection()
-        conn.search(search_base, ldap_filter, search_scope=SUBTREE,
-                     attributes=USER_ATTRIBUTES, paged_size=1000)
-        users = []
-        for entry in conn.entries:
-            users.append({
-                'dn': str(entry.entry_dn),
-                'cn': str(entry.cn) if entry.cn else '',
-                'sam': str(entry.sAMAccountName) if entry.sAMAccountName else '',
-                'upn': str(entry.userPrincipalName) if entry.userPrincipalName else '',
-                'first_name': str(entry.givenName) if entry.givenName else '',
-                'last_name': str(entry.sn) if entry.sn else '',
-                'display_name': str(entry.displayName) if entry.displayName else '',
-                'email': str(entry.mail) if entry.mail else '',
-                'phone': str(entry.telephoneNumber) if entry.telephoneNumber else '',
-                'department': str(entry.department) if entry.department else '',
-                'title': str(entry.title) if entry.title else '',
-                'status': _user_status(entry),
-                'last_logon': str(entry.lastLogon) if entry.lastLogon.value else 'Never',
-                'when_created': str(entry.whenCreated) if entry.whenCreated else '',
-            })
-        return True, users
+        with pooled_connection() as conn:
+            # Stream every page instead of stopping at the first 1000 entries
+            entries = conn.extend.standard.paged_search(
+                search_base, ldap_filter, search_scope=SUBTREE,
+                attributes=USER_LIST_ATTRIBUTES, paged_size=500, generator=True)
+            users = []
+            for entry in entries:
+                if entry['type'] != 'searchResEntry':
+                    continue
+                attrs = entry['attributes']
+                last_logon = attrs.get('lastLogon')
+                users.append({
+                    'dn': entry['dn'],
+                    'cn': str(attrs.get('cn') or ''),
+                    'sam': str(attrs.get('sAMAccountName') or ''),
+                    'upn': str(attrs.get('userPrincipalName') or ''),
+                    'first_name': str(attrs.get('givenName') or ''),
+                    'last_name': str(attrs.get('sn') or ''),
+                    'display_name': str(attrs.get('displayName') or ''),
+                    'email': str(attrs.get('mail') or ''),
+                    'phone': str(attrs.get('telephoneNumber') or ''),
+                    'department': str(attrs.get('department') or ''),
+                    'title': str(attrs.get('title') or ''),
+                    'status': _user_status(attrs.get('userAccountControl'), attrs.get('lockoutTime')),
+                    'last_logon': str(last_logon) if last_logon else 'Never',
+                    'when_created': str(attrs.get('whenCreated') or ''),
+                })
+            return True, users
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
 
 
 def get_user(sam_account_name):
     cfg = current_app.config
-    ldap_filter = f'(&{USER_FILTER}(sAMAccountName={escape_rdn(sam_account_name)}))'
-    conn = None
+    ldap_filter = _user_filter(sam_account_name)
     try:
-        conn = get_connection()
-        conn.search(cfg['BASE_DN'], ldap_filter, search_scope=SUBTREE,
-                     attributes=USER_ATTRIBUTES)
-        if not conn.entries:
-            return False, 'User not found'
-        entry = conn.entries[0]
-
-        def _safe(attr):
-            """Safely get a string attribute value."""
-            try:
-                val = getattr(entry, attr, None)
-                if val is None:
-                    return ''
-                if hasattr(val, 'value'):
-                    return str(val) if val.value else ''
-                return str(val) if val else ''
-            except Exception:
-                return ''
-
-        user = {
-            'dn': str(entry.entry_dn),
-            'cn': _safe('cn'),
-            'sam': _safe('sAMAccountName'),
-            'upn': _safe('userPrincipalName'),
-            'first_name': _safe('givenName'),
-            'last_name': _safe('sn'),
-            'display_name': _safe('displayName'),
-            'email': _safe('mail'),
-            'phone': _safe('telephoneNumber'),
-            'mobile': _safe('mobile'),
-            'title': _safe('title'),
-            'department': _safe('department'),
-            'company': _safe('company'),
-            'description': _safe('description'),
-            'manager': _safe('manager'),
-            'member_of': [str(g) for g in entry.memberOf] if hasattr(entry, 'memberOf') and entry.memberOf else [],
-            'status': _user_status(entry),
-            'uac': int(entry.userAccountControl.value) if entry.userAccountControl.value else 512,
-            'last_logon': str(entry.lastLogon) if hasattr(entry, 'lastLogon') and entry.lastLogon.value else 'Never',
-            'pwd_last_set': _safe('pwdLastSet'),
-            'when_created': _safe('whenCreated'),
-            'when_changed': _safe('whenChanged'),
-            'account_expires': _filetime_to_date(_safe('accountExpires') or 0),
-            'account_expires_raw': _safe('accountExpires'),
-        }
-        # Extension attributes (skip if schema doesn't support them)
-        for attr in EXTENSION_ATTRS:
-            user[attr] = _safe(attr)
-        return True, user
+        with pooled_connection() as conn:
+            conn.search(cfg['BASE_DN'], ldap_filter, search_scope=SUBTREE,
+                         attributes=USER_ATTRIBUTES)
+            if not conn.entries:
+                return False, 'User not found'
+            entry = conn.entries[0]
+
+            # Plain dict of value lists, read once instead of through
+            # ldap3's attribute descriptors for every field
+            attrs = entry.entry_attributes_as_dict
+
+            def _safe(attr):
+                """First value of an attribute as a string, or '' if unset."""
+                values = attrs.get(attr)
+                return str(values[0]) if values and values[0] else ''
+
+            uac = int((attrs.get('userAccountControl') or [512])[0] or 512)
+            lockout = (attrs.get('lockoutTime') or [None])[0]
+            user = {
+                'dn': str(entry.entry_dn),
+                'cn': _safe('cn'),
+                'sam': _safe('sAMAccountName'),
+                'upn': _safe('userPrincipalName'),
+                'first_name': _safe('givenName'),
+                'last_name': _safe('sn'),
+                'display_name': _safe('displayName'),
+                'email': _safe('mail'),
+                'phone': _safe('telephoneNumber'),
+                'mobile': _safe('mobile'),
+                'title': _safe('title'),
+                'department': _safe('department'),
+                'company': _safe('company'),
+                'description': _safe('description'),
+                'manager': _safe('manager'),
+                'member_of': list(attrs.get('memberOf') or []),
+                'status': _user_status(uac, lockout),
+                'uac': uac,
+                'last_logon': _safe('lastLogon') or 'Never',
+                'pwd_last_set': _safe('pwdLastSet'),
+                'when_created': _safe('whenCreated'),
+                'when_changed': _safe('whenChanged'),
+                'account_expires': _filetime_to_date(_safe('accountExpires') or 0),
+                'account_expires_raw': _safe('accountExpires'),
+            }
+            # Extension attributes (skip if schema doesn't support them)
+            for attr in EXTENSION_ATTRS:
+                user[attr] = _safe(attr)
+            return True, user
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
 
 
-def create_user(fname, lname, username, password, email='', phone='', mobile='',
+def _build_user(fname, lname, username, email='', phone='', mobile='',
                 title='', department='', company='', description='',
                 target_ou=None):
+    """Return (user_dn, attributes) for a new user account."""
     cfg = current_app.config
     ou = target_ou or cfg['USER_OU']
     cn = f"{fname} {lname}"
@@ -191,194 +221,211 @@ def create_user(fname, lname, username, password, email='', phone='', mobile='',
         attributes['company'] = company
     if description:
         attributes['description'] = description
+    return user_dn, attributes
 
-    conn = None
-    try:
-        conn = get_connection()
-        if not conn.add(user_dn, attributes=attributes):
-            return False, conn.result.get('description', 'Failed to create user')
 
-        # Set password (AD requires quoted UTF-16-LE)
-        encoded_pw = ('"%s"' % password).encode('utf-16-le')
-        conn.extend.microsoft.modify_password(user_dn, encoded_pw)
+def _create_user_on_conn(conn, user_dn, attributes, password):
+    """Add, set the password of, and enable a user on an already bound connection."""
+    if not conn.add(user_dn, attributes=attributes):
+        return False, conn.result.get('description', 'Failed to create user')
+
+    # Set password (AD requires quoted UTF-16-LE)
+    encoded_pw = ('"%s"' % password).encode('utf-16-le')
+    conn.extend.microsoft.modify_password(user_dn, encoded_pw)
+
+    # Enable account (512 = NORMAL_ACCOUNT)
+    conn.modify(user_dn, {'userAccountControl': [(MODIFY_REPLACE, 512)]})
+
+    return True, f"User '{attributes['sAMAccountName']}' created successfully."
 
-        # Enable account (512 = NORMAL_ACCOUNT)
-        conn.modify(user_dn, {'userAccountControl': [(MODIFY_REPLACE, 512)]})
 
-        return True, f"User '{username}' created successfully."
+def create_user(fname, lname, username, password, email='', phone='', mobile='',
+                title='', department='', company='', description='',
+                target_ou=None):
+    user_dn, attributes = _build_user(
+        fname, lname, username, email=email, phone=phone, mobile=mobile,
+        title=title, department=department, company=company,
+        description=description, target_ou=target_ou,
+    )
+    try:
+        with pooled_connection() as conn:
+            return _create_user_on_conn(conn, user_dn, attributes, password)
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
 
 
 def modify_user(user_dn, changes):
     """Modify user attributes. changes is a dict of {attr_name: new_value}."""
-    conn = None
     try:
-        conn = get_connection()
-        modifications = {}
-        for attr, value in changes.items():
-            # Skip empty extension attributes to avoid schema errors
-            if attr.startswith('extensionAttribute') and not value:
-                continue
-            # Handle accountExpires specially (needs FILETIME conversion)
-            if attr == 'accountExpires':
-                ft = _date_to_filetime(value)
-                modifications[attr] = [(MODIFY_REPLACE, [ft])]
-                continue
-            if value:
-                modifications[attr] = [(MODIFY_REPLACE, [value])]
-            else:
-                modifications[attr] = [(MODIFY_REPLACE, [])]
-
-        if not conn.modify(user_dn, modifications):
-            return False, conn.result.get('description', 'Modification failed')
-        return True, 'User updated successfully.'
+        with pooled_connection() as conn:
+            modifications = {}
+            for attr, value in changes.items():
+                # Skip empty extension attributes to avoid schema errors
+                if attr.startswith('extensionAttribute') and not value:
+                    continue
+                # Handle accountExpires specially (needs FILETIME conversion)
+                if attr == 'accountExpires':
+                    ft = _date_to_filetime(value)
+                    modifications[attr] = [(MODIFY_REPLACE, [ft])]
+                    continue
+                if value:
+                    modifications[attr] = [(MODIFY_REPLACE, [value])]
+                else:
+                    modifications[attr] = [(MODIFY_REPLACE, [])]
+
+            if not conn.modify(user_dn, modifications):
+                return False, conn.result.get('description', 'Modification failed')
+            return True, 'User updated successfully.'
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
 
 
 def delete_user(user_dn):
-    conn = None
     try:
-        conn = get_connection()
-        if not conn.delete(user_dn):
-            return False, conn.result.get('description', 'Delete failed')
-        return True, 'User deleted successfully.'
+        with pooled_connection() as conn:
+            if not conn.delete(user_dn):
+                return False, conn.result.get('description', 'Delete failed')
+            return True, 'User deleted successfully.'
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
 
 
-def disable_user(user_dn):
-    conn = None
+def disable_user(user_dn, current_uac=None):
+    """Disable a user. Pass current_uac when the caller has just read it to skip the lookup."""
     try:
-        conn = get_connection()
-        conn.search(current_app.config['BASE_DN'],
-                     f'(distinguishedName={user_dn})',
-                     attributes=['userAccountControl'])
-        if not conn.entries:
-            return False, 'User not found'
-        current_uac = int(conn.entries[0].userAccountControl.value)
-        new_uac = current_uac | 2  # Set disabled bit
-        if not conn.modify(user_dn, {'userAccountControl': [(MODIFY_REPLACE, [new_uac])]}):
-            return False, conn.result.get('description', 'Failed to disable')
-        return True, 'User disabled.'
+        with pooled_connection() as conn:
+            if current_uac is None:
+                conn.search(user_dn, '(objectClass=*)', search_scope=BASE,
+                             attributes=['userAccountControl'])
+                if not conn.entries:
+                    return False, 'User not found'
+                current_uac = int(conn.entries[0].userAccountControl.value)
+            new_uac = current_uac | 2  # Set disabled bit
+            if not conn.modify(user_dn, {'userAccountControl': [(MODIFY_REPLACE, [new_uac])]}):
+                return False, conn.result.get('description', 'Failed to disable')
+            return True, 'User disabled.'
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
 
 
-def enable_user(user_dn):
-    conn = None
+def enable_user(user_dn, current_uac=None):
+    """Enable a user. Pass current_uac when the caller has just read it to skip the lookup."""
     try:
-        conn = get_connection()
-        conn.search(current_app.config['BASE_DN'],
-                     f'(distinguishedName={user_dn})',
-                     attributes=['userAccountControl'])
-        if not conn.entries:
-            return False, 'User not found'
-        current_uac = int(conn.entries[0].userAccountControl.value)
-        new_uac = current_uac & ~2  # Clear disabled bit
-        if not conn.modify(user_dn, {'userAccountControl': [(MODIFY_REPLACE, [new_uac])]}):
-            return False, conn.result.get('description', 'Failed to enable')
-        return True, 'User enabled.'
+        with pooled_connection() as conn:
+            if current_uac is None:
+                conn.search(user_dn, '(objectClass=*)', search_scope=BASE,
+                             attributes=['userAccountControl'])
+                if not conn.entries:
+                    return False, 'User not found'
+                current_uac = int(conn.entries[0].userAccountControl.value)
+            new_uac = current_uac & ~2  # Clear disabled bit
+            if not conn.modify(user_dn, {'userAccountControl': [(MODIFY_REPLACE, [new_uac])]}):
+                return False, conn.result.get('description', 'Failed to enable')
+            return True, 'User enabled.'
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
 
 
 def unlock_user(user_dn):
-    conn = None
     try:
-        conn = get_connection()
-        if not conn.modify(user_dn, {'lockoutTime': [(MODIFY_REPLACE, [0])]}):
-            return False, conn.result.get('description', 'Failed to unlock')
-        return True, 'User unlocked.'
+        with pooled_connection() as conn:
+            if not conn.modify(user_dn, {'lockoutTime': [(MODIFY_REPLACE, [0])]}):
+                return False, conn.result.get('description', 'Failed to unlock')
+            return True, 'User unlocked.'
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
 
 
 def reset_password(user_dn, new_password, must_change=False):
-    conn = None
     try:
-        conn = get_connection()
-        encoded_pw = ('"%s"' % new_password).encode('utf-16-le')
-        conn.extend.microsoft.modify_password(user_dn, encoded_pw)
-        if must_change:
-            conn.modify(user_dn, {'pwdLastSet': [(MODIFY_REPLACE, [0])]})
-        return True, 'Password reset successfully.' + (' User must change at next logon.' if must_change else '')
+        with pooled_connection() as conn:
+            encoded_pw = ('"%s"' % new_password).encode('utf-16-le')
+            conn.extend.microsoft.modify_password(user_dn, encoded_pw)
+            if must_change:
+                conn.modify(user_dn, {'pwdLastSet': [(MODIFY_REPLACE, [0])]})
+            return True, 'Password reset successfully.' + (' User must change at next logon.' if must_change else '')
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
 
 
 def get_user_groups(user_dn):
     cfg = current_app.config
-    conn = None
     try:
-        conn = get_connection()
-        conn.search(cfg['BASE_DN'], f'(member={user_dn})',
-                     search_scope=SUBTREE, attributes=['cn', 'distinguishedName'])
-        groups = [{'cn': str(e.cn), 'dn': str(e.entry_dn)} for e in conn.entries]
-        return True, groups
+        with pooled_connection() as conn:
+            conn.search(cfg['BASE_DN'], f'(member={user_dn})',
+                         search_scope=SUBTREE, attributes=['cn', 'distinguishedName'])
+            groups = [{'cn': str(e.cn), 'dn': str(e.entry_dn)} for e in conn.entries]
+            return True, groups
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
 
 
 def bulk_import(csv_content):
     """Import users from CSV. Expected columns: fname,lname,username,password,email,department,title"""
     reader = csv.DictReader(io.StringIO(csv_content))
     results = []
-    for row in reader:
-        fname = row.get('fname', '').strip()
-        lname = row.get('lname', '').strip()
-        username = row.get('username', '').strip()
-        password = row.get('password', '').strip()
-        if not all([fname, lname, username, password]):
-            results.append({'username': username or '(empty)', 'success': False, 'message': 'Missing required fields'})
-            continue
-        success, msg = create_user(
-            fname, lname, username, password,
-            email=row.get('email', '').strip(),
-            department=row.get('department', '').strip(),
-            title=row.get('title', '').strip(),
-        )
-        results.append({'username': username, 'success': success, 'message': msg})
+    try:
+        # One connection for the whole import rather than one per row
+        with pooled_connection() as conn:
+            for row in reader:
+                fname = row.get('fname', '').strip()
+                lname = row.get('lname', '').strip()
+                username = row.get('username', '').strip()
+                password = row.get('password', '').strip()
+                if not all([fname, lname, username, password]):
+                    results.append({'username': username or '(empty)', 'success': False, 'message': 'Missing required fields'})
+                    continue
+                user_dn, attributes = _build_user(
+                    fname, lname, username,
+                    email=row.get('email', '').strip(),
+                    department=row.get('department', '').strip(),
+                    title=row.get('title', '').strip(),
+                )
+                try:
+                    success, msg = _create_user_on_conn(conn, user_dn, attributes, password)
+                except Exception as e:
+                    success, msg = False, str(e)
+                results.append({'username': username, 'success': success, 'message': msg})
+    except Exception as e:
+        results.append({'username': '(connection)', 'success': False, 'message': str(e)})
     return results
 
 
+# CSV header for export_users, and the attributes each row is built from
+EXPORT_FIELDS = [
+    'sam', 'first_name', 'last_name', 'display_name', 'email',
+    'phone', 'department', 'title', 'status', 'when_created',
+]
+_EXPORT_TEXT_ATTRIBUTES = [
+    'sAMAccountName', 'givenName', 'sn', 'displayName', 'mail',
+    'telephoneNumber', 'department', 'title',
+]
+
+
+def _export_row(attrs):
+    row = [str(attrs.get(name) or '') for name in _EXPORT_TEXT_ATTRIBUTES]
+    row.append(_user_status(attrs.get('userAccountControl'), attrs.get('lockoutTime')))
+    row.append(str(attrs.get('whenCreated') or ''))
+    return row
+
+
 def export_users(ou=None):
     """Export all users as CSV string."""
-    success, users = search_users('*', ou)
-    if not success:
-        return False, users
-
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=[
-        'sam', 'first_name', 'last_name', 'display_name', 'email',
-        'phone', 'department', 'title', 'status', 'when_created',
-    ])
-    writer.writeheader()
-    for u in users:
-        writer.writerow({k: u.get(k, '') for k in writer.fieldnames})
-    return True, output.getvalue()
+    cfg = current_app.config
+    search_base = ou or cfg.get('USER_SEARCH_BASE') or cfg['BASE_DN']
+    try:
+        with pooled_connection() as conn:
+            # Rows are written straight from the paged results, without
+            # building a list of user dicts first
+            entries = conn.extend.standard.paged_search(
+                search_base, USER_FILTER, search_scope=SUBTREE,
+                attributes=_EXPORT_TEXT_ATTRIBUTES + ['userAccountControl', 'lockoutTime', 'whenCreated'],
+                paged_size=500, generator=True)
+            output = io.StringIO()
+            writer = csv.writer(output)
+            writer.writerow(EXPORT_FIELDS)
+            writer.writerows(_export_row(entry['attributes']) for entry in entries
+                             if entry['type'] == 'searchResEntry')
+            return True, output.getvalue()
+    except Exception as e:
+        return False, str(e)
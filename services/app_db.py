@@ -0,0 +1,32 @@
+"""Shared SQLite connection for the app database.
+
+The audit log, app settings, dynamic groups and scheduled reports all live
+in the same AUDIT_DB_PATH file, so they share one connection per thread and
+one set of pragmas.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+DB_PATH = os.environ.get('AUDIT_DB_PATH', '/app/data/audit.db')
+
+# One connection per thread, reused for every query on that thread
+_local = threading.local()
+
+
+def get_db():
+    """Return this thread's SQLite connection, opening it on first use."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers run while a write commits; NORMAL sync is safe under WAL
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA mmap_size=268435456')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        _local.conn = conn
+    return conn
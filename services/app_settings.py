@@ -3,53 +3,52 @@
 Settings override environment variables at runtime without container rebuild.
 """
 
-import sqlite3
-import os
+import threading
 import json
-from flask import current_app
+from datetime import datetime
 
-DB_PATH = os.environ.get('AUDIT_DB_PATH', '/app/data/audit.db')
+from flask import current_app
 
+from .app_db import get_db
 
-def _get_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Per-thread cache of get_all_settings(); see there
+_local = threading.local()
 
 
 def init_settings_db():
     """Create the settings table if it doesn't exist."""
-    db = _get_db()
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS app_settings (
-            key TEXT PRIMARY KEY,
-            value TEXT NOT NULL,
-            updated_at TEXT
-        )
-    ''')
-    db.commit()
-    db.close()
+    db = get_db()
+    with db:
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS app_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                updated_at TEXT
+            )
+        ''')
 
 
 def get_setting(key, default=''):
     """Get a single setting value."""
-    try:
-        db = _get_db()
-        row = db.execute('SELECT value FROM app_settings WHERE key = ?', (key,)).fetchone()
-        db.close()
-        return row['value'] if row else default
-    except Exception:
-        return default
+    return get_all_settings().get(key, default)
 
 
 def get_all_settings():
-    """Get all settings as a dict."""
+    """Get all settings as a dict.
+
+    The last result is cached per thread alongside SQLite's data_version,
+    which only changes when another connection (another thread or worker
+    process) commits, so the table is re-read only after a change.
+    """
     try:
-        db = _get_db()
-        rows = db.execute('SELECT key, value FROM app_settings').fetchall()
-        db.close()
-        return {r['key']: r['value'] for r in rows}
+        db = get_db()
+        version = db.execute('PRAGMA data_version').fetchone()[0]
+        cached = getattr(_local, 'settings', None)
+        if cached is None or cached[0] != version:
+            rows = db.execute('SELECT key, value FROM app_settings').fetchall()
+            cached = (version, {r['key']: r['value'] for r in rows})
+            _local.settings = cached
+        return dict(cached[1])
     except Exception:
         return {}
 
@@ -57,15 +56,15 @@ def get_all_settings():
 def save_setting(key, value):
     """Save a setting (insert or update)."""
     try:
-        from datetime import datetime
-        db = _get_db()
+        db = get_db()
         now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        db.execute(
-            'INSERT OR REPLACE INTO app_settings (key, value, updated_at) VALUES (?, ?, ?)',
-            (key, value, now)
-        )
-        db.commit()
-        db.close()
+        with db:
+            db.execute(
+                'INSERT OR REPLACE INTO app_settings (key, value, updated_at) VALUES (?, ?, ?)',
+                (key, value, now)
+            )
+        # Our own commits don't bump data_version on this connection
+        _local.settings = None
         return True
     except Exception:
         return False
@@ -74,16 +73,15 @@ def save_setting(key, value):
 def save_settings(settings_dict):
     """Save multiple settings at once."""
     try:
-        from datetime import datetime
-        db = _get_db()
+        db = get_db()
         now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        for key, value in settings_dict.items():
-            db.execute(
+        rows = [(key, str(value), now) for key, value in settings_dict.items()]
+        with db:
+            db.executemany(
                 'INSERT OR REPLACE INTO app_settings (key, value, updated_at) VALUES (?, ?, ?)',
-                (key, str(value), now)
+                rows
             )
-        db.commit()
-        db.close()
+        _local.settings = None
         return True, 'Settings saved.'
     except Exception as e:
         return False, str(e)
@@ -1,47 +1,65 @@
 import sqlite3
-import os
 from datetime import datetime
 from flask import session
 
+from .app_db import get_db
 
-DB_PATH = os.environ.get('AUDIT_DB_PATH', '/app/data/audit.db')
 
-
-def _get_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Trigram full-text index over target, used for substring lookups in
+# get_target_history. Left off if this SQLite build lacks FTS5 trigram.
+_fts_enabled = False
 
 
 def init_db():
-    db = _get_db()
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS audit_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            user TEXT NOT NULL,
-            action TEXT NOT NULL,
-            target TEXT NOT NULL,
-            details TEXT,
-            result TEXT NOT NULL
-        )
-    ''')
-    db.commit()
-    db.close()
+    global _fts_enabled
+    db = get_db()
+    with db:
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS audit_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                user TEXT NOT NULL,
+                action TEXT NOT NULL,
+                target TEXT NOT NULL,
+                details TEXT,
+                result TEXT NOT NULL
+            )
+        ''')
+    try:
+        with db:
+            exists = db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'audit_fts'").fetchone()
+            db.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS audit_fts USING fts5(
+                    target,
+                    content='audit_log', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+            db.execute('''
+                CREATE TRIGGER IF NOT EXISTS audit_log_fts_insert AFTER INSERT ON audit_log BEGIN
+                    INSERT INTO audit_fts (rowid, target) VALUES (new.id, new.target);
+                END
+            ''')
+            if not exists:
+                # Index rows written before the FTS table existed
+                db.execute("INSERT INTO audit_fts (audit_fts) VALUES ('rebuild')")
+        _fts_enabled = True
+    except sqlite3.OperationalError:
+        _fts_enabled = False
 
 
 def log_action(action, target, details='', result='success'):
     user = session.get('username', 'system')
     timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    # Written before returning, so the page shown after the action (possibly
+    # served by another worker) already includes it
     try:
-        db = _get_db()
-        db.execute(
-            'INSERT INTO audit_log (timestamp, user, action, target, details, result) VALUES (?, ?, ?, ?, ?, ?)',
-            (timestamp, user, action, target, details, result)
-        )
-        db.commit()
-        db.close()
+        db = get_db()
+        with db:
+            db.execute(
+                'INSERT INTO audit_log (timestamp, user, action, target, details, result) VALUES (?, ?, ?, ?, ?, ?)',
+                (timestamp, user, action, target, details, result)
+            )
     except Exception:
         pass  # Don't let audit failures break the app
 
@@ -49,12 +67,20 @@ def log_action(action, target, details='', result='success'):
 def get_target_history(target, limit=50):
     """Get audit log entries for a specific target (e.g. a user's sAMAccountName)."""
     try:
-        db = _get_db()
-        rows = db.execute(
-            'SELECT * FROM audit_log WHERE target LIKE ? ORDER BY id DESC LIMIT ?',
-            (f'%{target}%', limit)
-        ).fetchall()
-        db.close()
+        db = get_db()
+        # Trigrams need at least three characters to match on
+        if _fts_enabled and len(target) >= 3:
+            phrase = '"' + target.replace('"', '""') + '"'
+            rows = db.execute(
+                'SELECT audit_log.* FROM audit_fts JOIN audit_log ON audit_log.id = audit_fts.rowid '
+                'WHERE audit_fts MATCH ? ORDER BY audit_log.id DESC LIMIT ?',
+                (phrase, limit)
+            ).fetchall()
+        else:
+            rows = db.execute(
+                'SELECT * FROM audit_log WHERE target LIKE ? ORDER BY id DESC LIMIT ?',
+                (f'%{target}%', limit)
+            ).fetchall()
         return [dict(r) for r in rows]
     except Exception:
         return []
@@ -62,7 +88,7 @@ def get_target_history(target, limit=50):
 
 def get_audit_log(limit=200, offset=0, action_filter='', user_filter=''):
     try:
-        db = _get_db()
+        db = get_db()
         query = 'SELECT * FROM audit_log WHERE 1=1'
         params = []
         if action_filter:
@@ -75,7 +101,6 @@ def get_audit_log(limit=200, offset=0, action_filter='', user_filter=''):
         params.extend([limit, offset])
         rows = db.execute(query, params).fetchall()
         total = db.execute('SELECT COUNT(*) FROM audit_log').fetchone()[0]
-        db.close()
         return [dict(r) for r in rows], total
     except Exception:
         return [], 0
@@ -3,50 +3,37 @@
 Groups are saved in SQLite and evaluated on-the-fly against AD.
 """
 
-import sqlite3
-import os
 from datetime import datetime
 
 from ldap3 import SUBTREE
 from flask import current_app, session
 
-from .ad_connection import get_connection
-
-
-DB_PATH = os.environ.get('AUDIT_DB_PATH', '/app/data/audit.db')
-
-
-def _get_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+from .ad_connection import pooled_connection
+from .app_db import get_db
 
 
 def init_dynamic_groups_db():
     """Create the dynamic_groups table if it doesn't exist."""
-    db = _get_db()
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS dynamic_groups (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            ldap_filter TEXT NOT NULL,
-            created_by TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            updated_at TEXT
-        )
-    ''')
-    db.commit()
-    db.close()
+    db = get_db()
+    with db:
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS dynamic_groups (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                description TEXT,
+                ldap_filter TEXT NOT NULL,
+                created_by TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT
+            )
+        ''')
 
 
 def list_dynamic_groups():
     """Get all saved dynamic groups."""
     try:
-        db = _get_db()
+        db = get_db()
         rows = db.execute('SELECT * FROM dynamic_groups ORDER BY name').fetchall()
-        db.close()
         return [dict(r) for r in rows]
     except Exception:
         return []
@@ -55,9 +42,8 @@ def list_dynamic_groups():
 def get_dynamic_group(group_id):
     """Get a single dynamic group by ID."""
     try:
-        db = _get_db()
+        db = get_db()
         row = db.execute('SELECT * FROM dynamic_groups WHERE id = ?', (group_id,)).fetchone()
-        db.close()
         return dict(row) if row else None
     except Exception:
         return None
@@ -66,15 +52,14 @@ def get_dynamic_group(group_id):
 def create_dynamic_group(name, description, ldap_filter):
     """Create a new dynamic group."""
     try:
-        db = _get_db()
+        db = get_db()
         now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
         user = session.get('username', 'system')
-        db.execute(
-            'INSERT INTO dynamic_groups (name, description, ldap_filter, created_by, created_at) VALUES (?, ?, ?, ?, ?)',
-            (name, description, ldap_filter, user, now)
-        )
-        db.commit()
-        db.close()
+        with db:
+            db.execute(
+                'INSERT INTO dynamic_groups (name, description, ldap_filter, created_by, created_at) VALUES (?, ?, ?, ?, ?)',
+                (name, description, ldap_filter, user, now)
+            )
         return True, 'Dynamic group created.'
     except Exception as e:
         return False, str(e)
@@ -83,14 +68,13 @@ def create_dynamic_group(name, description, ldap_filter):
 def update_dynamic_group(group_id, name, description, ldap_filter):
     """Update an existing dynamic group."""
     try:
-        db = _get_db()
+        db = get_db()
         now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        db.execute(
-            'UPDATE dynamic_groups SET name=?, description=?, ldap_filter=?, updated_at=? WHERE id=?',
-            (name, description, ldap_filter, now, group_id)
-        )
-        db.commit()
-        db.close()
+        with db:
+            db.execute(
+                'UPDATE dynamic_groups SET name=?, description=?, ldap_filter=?, updated_at=? WHERE id=?',
+                (name, description, ldap_filter, now, group_id)
+            )
         return True, 'Dynamic group updated.'
     except Exception as e:
         return False, str(e)
@@ -99,58 +83,92 @@ def update_dynamic_group(group_id, name, description, ldap_filter):
 def delete_dynamic_group(group_id):
     """Delete a dynamic group."""
     try:
-        db = _get_db()
-        db.execute('DELETE FROM dynamic_groups WHERE id = ?', (group_id,))
-        db.commit()
-        db.close()
+        db = get_db()
+        with db:
+            db.execute('DELETE FROM dynamic_groups WHERE id = ?', (group_id,))
         return True, 'Dynamic group deleted.'
     except Exception as e:
         return False, str(e)
 
 
-def evaluate_dynamic_group(ldap_filter, limit=500):
-    """Run the LDAP filter against AD and return matching objects."""
+# Attributes needed to report each object type; objectClass is only fetched
+# when the type isn't known up front
+EVALUATE_ATTRIBUTES = {
+    'user': ['cn', 'sAMAccountName', 'userAccountControl'],
+    'computer': ['cn', 'sAMAccountName', 'userAccountControl'],
+    'group': ['cn', 'sAMAccountName'],
+    None: ['cn', 'sAMAccountName', 'objectClass', 'userAccountControl'],
+}
+
+# Filter clauses that pin the result to a single object type. objectClass=user
+# is deliberately absent, since computers match it too.
+_TYPE_CLAUSES = {
+    '(objectcategory=person)': 'user',
+    '(objectclass=computer)': 'computer',
+    '(objectcategory=computer)': 'computer',
+    '(objectclass=group)': 'group',
+    '(objectcategory=group)': 'group',
+}
+
+
+def _filter_type_hint(ldap_filter):
+    """Guess the single object type a filter returns, or None if unsure."""
+    f = ldap_filter.replace(' ', '').lower()
+    if '|' in f or '!' in f:
+        return None
+    types = {t for clause, t in _TYPE_CLAUSES.items() if clause in f}
+    return types.pop() if len(types) == 1 else None
+
+
+def evaluate_dynamic_group(ldap_filter, limit=500, type_hint=None):
+    """Run the LDAP filter against AD and return matching objects.
+
+    type_hint ('user', 'computer' or 'group') skips per-entry objectClass
+    detection; when omitted it is inferred from the filter where that's
+    unambiguous.
+    """
     cfg = current_app.config
-    conn = None
+    if type_hint is None:
+        type_hint = _filter_type_hint(ldap_filter)
     try:
-        conn = get_connection()
-        conn.search(
-            cfg['BASE_DN'], ldap_filter, search_scope=SUBTREE,
-            attributes=['cn', 'sAMAccountName', 'distinguishedName',
-                        'objectClass', 'userAccountControl'],
-            size_limit=limit,
-        )
-        results = []
-        for entry in conn.entries:
-            def _safe(attr, e=entry):
-                try:
-                    return e[attr].value
-                except Exception:
-                    return None
-
-            obj_classes = _safe('objectClass') or []
-            if isinstance(obj_classes, str):
-                obj_classes = [obj_classes]
-
-            obj_type = 'user'
-            if 'computer' in obj_classes:
-                obj_type = 'computer'
-            elif 'group' in obj_classes:
-                obj_type = 'group'
-
-            uac = int(_safe('userAccountControl') or 512)
-            status = 'disabled' if uac & 0x2 else 'enabled'
-
-            results.append({
-                'cn': str(_safe('cn') or ''),
-                'sam': str(_safe('sAMAccountName') or ''),
-                'dn': str(entry.entry_dn),
-                'type': obj_type,
-                'status': status,
-            })
-        return True, results
+        with pooled_connection() as conn:
+            entries = conn.extend.standard.paged_search(
+                cfg['BASE_DN'], ldap_filter, search_scope=SUBTREE,
+                attributes=EVALUATE_ATTRIBUTES[type_hint],
+                paged_size=min(limit, 500),
+                # The DC ends the paged search itself at limit entries, so no
+                # half-read cursor is left on the pooled connection
+                size_limit=limit,
+                generator=True,
+            )
+            results = []
+            for entry in entries:
+                if entry['type'] != 'searchResEntry':
+                    continue
+                attrs = entry['attributes']
+
+                obj_type = type_hint
+                if obj_type is None:
+                    obj_classes = attrs.get('objectClass') or []
+                    if isinstance(obj_classes, str):
+                        obj_classes = [obj_classes]
+
+                    obj_type = 'user'
+                    if 'computer' in obj_classes:
+                        obj_type = 'computer'
+                    elif 'group' in obj_classes:
+                        obj_type = 'group'
+
+                uac = int(attrs.get('userAccountControl') or 512)
+                status = 'disabled' if uac & 0x2 else 'enabled'
+
+                results.append({
+                    'cn': str(attrs.get('cn') or ''),
+                    'sam': str(attrs.get('sAMAccountName') or ''),
+                    'dn': entry['dn'],
+                    'type': obj_type,
+                    'status': status,
+                })
+            return True, results
     except Exception as e:
         return False, str(e)
-    finally:
-        if conn:
-            conn.unbind()
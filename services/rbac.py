@@ -7,16 +7,21 @@ Roles are mapped to AD groups:
   - viewer: Configurable AD group (read-only access)
 """
 
-import ssl
+import sys
+import time
 from functools import wraps
 
 from flask import session, flash, redirect, url_for, current_app
-from ldap3 import Server, Connection, NTLM, Tls, SUBTREE, ALL
+from ldap3 import SUBTREE
+from ldap3.utils.conv import escape_filter_chars
+
+from .ad_connection import pooled_connection
+from .app_db import get_db
 
 
 # Permission definitions per role
 ROLE_PERMISSIONS = {
-    'admin': {
+    'admin': frozenset({
         'users.view', 'users.create', 'users.edit', 'users.delete',
         'users.disable', 'users.enable', 'users.unlock', 'users.reset_password',
         'users.move', 'users.bulk', 'users.copy', 'users.compare',
@@ -47,15 +52,15 @@ ROLE_PERMISSIONS = {
         'reports.export',
         # Round 3 permissions
         'lockout.view',
-        'sites.view',
+        'sites.view', 'sites.manage',
         'acl.view',
         'bulk_attr.edit',
         'schema.view',
         'replication.view',
         'dynamic_groups.view', 'dynamic_groups.manage',
         'settings.manage',
-    },
-    'helpdesk': {
+    }),
+    'helpdesk': frozenset({
         'users.view', 'users.unlock', 'users.reset_password',
         'users.disable', 'users.enable', 'users.compare',
         'groups.view',
@@ -74,8 +79,8 @@ ROLE_PERMISSIONS = {
         'lockout.view',
         'sites.view', 'schema.view',
         'dynamic_groups.view',
-    },
-    'viewer': {
+    }),
+    'viewer': frozenset({
         'users.view', 'users.compare',
         'groups.view',
         'computers.view',
@@ -90,98 +95,130 @@ ROLE_PERMISSIONS = {
         'lockout.view',
         'sites.view', 'schema.view',
         'dynamic_groups.view',
-    },
+    }),
+}
+
+# permission -> roles granted it, so a check is one dict and one set lookup
+_PERMISSION_ROLES = {
+    sys.intern(permission): frozenset(role for role, perms in ROLE_PERMISSIONS.items() if permission in perms)
+    for permission in frozenset().union(*ROLE_PERMISSIONS.values())
 }
 
 
+# Resolved roles keyed by (DC, lowercased sAMAccountName)
+# -> (monotonic ts, generation, role)
+_role_cache = {}
+
+
+def init_rbac_db():
+    """Create the table holding the shared role cache generation."""
+    db = get_db()
+    with db:
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS rbac_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+
+
+def _role_generation():
+    """Current role cache generation, shared by every worker process."""
+    row = get_db().execute(
+        "SELECT value FROM rbac_state WHERE key = 'role_generation'").fetchone()
+    return row['value'] if row else 0
+
+
+def invalidate_role_cache():
+    """Forget cached roles in every worker process.
+
+    Bumps the generation stored in the app database; each worker drops its
+    cached roles the next time it sees a different generation.
+    """
+    _role_cache.clear()
+    try:
+        db = get_db()
+        with db:
+            db.execute(
+                "INSERT INTO rbac_state (key, value) VALUES ('role_generation', 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+    except Exception:
+        pass
+
+
 def get_user_role(cfg, username):
     """Determine the user's role based on AD group membership.
 
-    Returns the highest-privilege role the user qualifies for.
+    Returns the highest-privilege role the user qualifies for. Results,
+    including "no role", are cached for RBAC_CACHE_TTL seconds; lookups that
+    fail are not. Membership changes made through this app invalidate the
+    cache in all workers at once; changes made directly in AD can take up
+    to RBAC_CACHE_TTL seconds to apply.
     """
+    key = (cfg['AD_SERVER_IP'], username.lower())
     try:
-        tls_config = Tls(validate=ssl.CERT_NONE, version=ssl.PROTOCOL_TLSv1_2)
-        server = Server(
-            f"ldaps://{cfg['AD_SERVER_IP']}:636",
-            get_info=ALL, use_ssl=True, tls=tls_config,
-        )
-        conn = Connection(
-            server,
-            user=f"{cfg['AD_DOMAIN']}\\{cfg['AD_USER']}",
-            password=cfg['AD_PASSWORD'],
-            authentication=NTLM, auto_bind=True,
-        )
+        generation = _role_generation()
+    except Exception:
+        generation = None  # Can't tell if the cache is current; don't use it
+    hit = _role_cache.get(key)
+    if (hit and generation is not None and hit[1] == generation
+            and time.monotonic() - hit[0] < cfg.get('RBAC_CACHE_TTL', 60)):
+        return hit[2]
+    try:
+        role = _resolve_role(cfg, username)
+    except Exception:
+        return None
+    if generation is not None:
+        _role_cache[key] = (time.monotonic(), generation, role)
+    return role
+
 
+def _resolve_role(cfg, username):
+    """Look up username's role in AD; raises on connection or search errors."""
+    with pooled_connection() as conn:
         # Find the user's DN
         user_filter = (
             f'(&(objectClass=user)(objectCategory=person)'
-            f'(sAMAccountName={username}))'
+            f'(sAMAccountName={escape_filter_chars(username)}))'
         )
         conn.search(cfg['BASE_DN'], user_filter, search_scope=SUBTREE,
-                     attributes=['distinguishedName'])
+                    attributes=['distinguishedName'])
         if not conn.entries:
-            conn.unbind()
             return None
-
-        # Check Domain Admins (always = admin role)
-        da_role = _check_group_membership(conn, cfg, username, 'Domain Admins')
-        if da_role:
-            conn.unbind()
-            return 'admin'
-
-        # Check configurable helpdesk group
-        helpdesk_group = cfg.get('HELPDESK_GROUP', '')
-        if helpdesk_group:
-            hd_role = _check_group_membership(conn, cfg, username, helpdesk_group)
-            if hd_role:
-                conn.unbind()
-                return 'helpdesk'
-
-        # Check configurable viewer group
-        viewer_group = cfg.get('VIEWER_GROUP', '')
-        if viewer_group:
-            vw_role = _check_group_membership(conn, cfg, username, viewer_group)
-            if vw_role:
-                conn.unbind()
-                return 'viewer'
-
-        conn.unbind()
-        return None
-    except Exception:
+        user_dn = str(conn.entries[0].entry_dn)
+
+        # Domain Admins always = admin role, then the configurable groups
+        role_groups = [('Domain Admins', 'admin')]
+        if cfg.get('HELPDESK_GROUP', ''):
+            role_groups.append((cfg['HELPDESK_GROUP'], 'helpdesk'))
+        if cfg.get('VIEWER_GROUP', ''):
+            role_groups.append((cfg['VIEWER_GROUP'], 'viewer'))
+
+        # One search returns every candidate group the user belongs to,
+        # including through nested groups
+        cn_clauses = ''.join(f'(cn={escape_filter_chars(cn)})' for cn, _ in role_groups)
+        conn.search(cfg['BASE_DN'],
+                    f'(&(objectClass=group)(|{cn_clauses})'
+                    f'(member:1.2.840.113556.1.4.1941:={escape_filter_chars(user_dn)}))',
+                    search_scope=SUBTREE, attributes=['cn'])
+        member_of = {str(e.cn.value).lower() for e in conn.entries}
+
+        for cn, role in role_groups:
+            if cn.lower() in member_of:
+                return role
         return None
 
 
-def _check_group_membership(conn, cfg, username, group_name):
-    """Check if user is a member of a group (including nested membership)."""
-    conn.search(cfg['BASE_DN'],
-                f'(&(objectClass=group)(cn={group_name}))',
-                search_scope=SUBTREE,
-                attributes=['distinguishedName'])
-    if not conn.entries:
-        return False
-    group_dn = str(conn.entries[0].entry_dn)
-
-    user_filter = (
-        f'(&(objectClass=user)(objectCategory=person)'
-        f'(sAMAccountName={username})'
-        f'(memberOf:1.2.840.113556.1.4.1941:={group_dn}))'
-    )
-    conn.search(cfg['BASE_DN'], user_filter, search_scope=SUBTREE,
-                 attributes=['distinguishedName'])
-    return len(conn.entries) > 0
-
-
 def has_permission(permission):
     """Check if the current session user has a specific permission."""
-    role = session.get('role', '')
-    if not role:
-        return False
-    permissions = ROLE_PERMISSIONS.get(role, set())
-    return permission in permissions
+    return session.get('role') in _PERMISSION_ROLES.get(permission, ())
 
 
 def require_permission(permission):
     """Decorator to require a specific permission for a route."""
+    # Interned like the _PERMISSION_ROLES keys, so the lookup matches by identity
+    permission = sys.intern(permission)
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
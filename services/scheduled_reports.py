@@ -6,71 +6,87 @@ Uses a background thread to check schedules periodically.
 
 import os
 import json
-import sqlite3
 import smtplib
 import threading
 import time
-from datetime import datetime, timezone
+from collections import namedtuple
+from functools import lru_cache
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 from flask import current_app
 
+from .app_db import get_db
 
-DB_PATH = os.environ.get('AUDIT_DB_PATH', '/app/data/audit.db')
 
 _scheduler_thread = None
 _scheduler_running = False
 
 
-def _get_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+@lru_cache(maxsize=2)
+def _utc_second_text(epoch_second):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(epoch_second))
+
+
+def _utc_now_text():
+    """Current UTC time as stored in created_at, formatted once per second."""
+    return _utc_second_text(int(time.time()))
+
+
+def _params_json(parameters):
+    """Serialize a parameters dict compactly for the parameters column."""
+    if not parameters:
+        return '{}'
+    return json.dumps(parameters, separators=(',', ':'))
 
 
 def init_scheduled_reports_db():
     """Create the scheduled_reports table if it doesn't exist."""
-    db = _get_db()
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS scheduled_reports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            report_type TEXT NOT NULL,
-            schedule TEXT NOT NULL,
-            recipients TEXT NOT NULL,
-            parameters TEXT DEFAULT '{}',
-            enabled INTEGER DEFAULT 1,
-            last_run TEXT,
-            last_status TEXT,
-            created_by TEXT NOT NULL,
-            created_at TEXT NOT NULL
-        )
-    ''')
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS alert_rules (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            alert_type TEXT NOT NULL,
-            recipients TEXT NOT NULL,
-            parameters TEXT DEFAULT '{}',
-            enabled INTEGER DEFAULT 1,
-            created_by TEXT NOT NULL,
-            created_at TEXT NOT NULL
-        )
-    ''')
-    db.commit()
-    db.close()
+    db = get_db()
+    with db:
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS scheduled_reports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                report_type TEXT NOT NULL,
+                schedule TEXT NOT NULL,
+                recipients TEXT NOT NULL,
+                parameters TEXT DEFAULT '{}',
+                enabled INTEGER DEFAULT 1,
+                last_run TEXT,
+                last_status TEXT,
+                created_by TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''')
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS alert_rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                alert_type TEXT NOT NULL,
+                recipients TEXT NOT NULL,
+                parameters TEXT DEFAULT '{}',
+                enabled INTEGER DEFAULT 1,
+                created_by TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''')
+        # Lookups of enabled schedules/alerts seek instead of scanning
+        db.execute('CREATE INDEX IF NOT EXISTS idx_sr_enabled ON scheduled_reports(enabled, last_run)')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_ar_enabled ON alert_rules(enabled)')
+
+
+# Columns the list views need; full rows come from get_schedule
+SCHEDULE_LIST_COLUMNS = 'id, name, report_type, schedule, recipients, enabled, last_run, last_status'
+ALERT_LIST_COLUMNS = 'id, name, alert_type, recipients, enabled'
 
 
 def get_all_schedules():
-    """Get all scheduled reports."""
+    """Get all scheduled reports as sqlite3.Row objects (index by column name)."""
     try:
-        db = _get_db()
-        rows = db.execute('SELECT * FROM scheduled_reports ORDER BY id DESC').fetchall()
-        db.close()
-        return [dict(r) for r in rows]
+        db = get_db()
+        return db.execute(
+            f'SELECT {SCHEDULE_LIST_COLUMNS} FROM scheduled_reports ORDER BY id DESC').fetchall()
     except Exception:
         return []
 
@@ -78,9 +94,8 @@ def get_all_schedules():
 def get_schedule(schedule_id):
     """Get a single scheduled report."""
     try:
-        db = _get_db()
+        db = get_db()
         row = db.execute('SELECT * FROM scheduled_reports WHERE id = ?', (schedule_id,)).fetchone()
-        db.close()
         return dict(row) if row else None
     except Exception:
         return None
@@ -89,32 +104,52 @@ def get_schedule(schedule_id):
 def create_schedule(name, report_type, schedule, recipients, parameters, created_by):
     """Create a new scheduled report."""
     try:
-        db = _get_db()
-        db.execute(
-            '''INSERT INTO scheduled_reports
-               (name, report_type, schedule, recipients, parameters, created_by, created_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?)''',
-            (name, report_type, schedule, recipients,
-             json.dumps(parameters), created_by,
-             datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
-        )
-        db.commit()
-        db.close()
+        db = get_db()
+        with db:
+            db.execute(
+                '''INSERT INTO scheduled_reports
+                   (name, report_type, schedule, recipients, parameters, created_by, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                (name, report_type, schedule, recipients,
+                 _params_json(parameters), created_by,
+                 _utc_now_text())
+            )
         return True, 'Schedule created successfully.'
     except Exception as e:
         return False, str(e)
 
 
+# Columns update_schedule may set; keys are interpolated into the SQL
+UPDATABLE_SCHEDULE_FIELDS = frozenset({
+    'name', 'report_type', 'schedule', 'recipients', 'parameters',
+    'enabled', 'last_run', 'last_status',
+})
+
+
+@lru_cache(maxsize=32)
+def _update_schedule_sql(columns):
+    """UPDATE statement for a tuple of whitelisted columns.
+
+    Returning the same string for the same columns lets sqlite3's statement
+    cache reuse the compiled statement.
+    """
+    assignments = ', '.join(f'{column} = ?' for column in columns)
+    return f'UPDATE scheduled_reports SET {assignments} WHERE id = ?'
+
+
 def update_schedule(schedule_id, **kwargs):
     """Update a scheduled report."""
     try:
-        db = _get_db()
-        for key, value in kwargs.items():
-            if key == 'parameters':
-                value = json.dumps(value)
-            db.execute(f'UPDATE scheduled_reports SET {key} = ? WHERE id = ?', (value, schedule_id))
-        db.commit()
-        db.close()
+        unknown = set(kwargs) - UPDATABLE_SCHEDULE_FIELDS
+        if unknown:
+            return False, f"Unknown schedule field(s): {', '.join(sorted(unknown))}"
+        if not kwargs:
+            return True, 'Schedule updated.'
+        if 'parameters' in kwargs:
+            kwargs['parameters'] = _params_json(kwargs['parameters'])
+        db = get_db()
+        with db:
+            db.execute(_update_schedule_sql(tuple(kwargs)), (*kwargs.values(), schedule_id))
         return True, 'Schedule updated.'
     except Exception as e:
         return False, str(e)
@@ -123,10 +158,9 @@ def update_schedule(schedule_id, **kwargs):
 def delete_schedule(schedule_id):
     """Delete a scheduled report."""
     try:
-        db = _get_db()
-        db.execute('DELETE FROM scheduled_reports WHERE id = ?', (schedule_id,))
-        db.commit()
-        db.close()
+        db = get_db()
+        with db:
+            db.execute('DELETE FROM scheduled_reports WHERE id = ?', (schedule_id,))
         return True, 'Schedule deleted.'
     except Exception as e:
         return False, str(e)
@@ -135,15 +169,13 @@ def delete_schedule(schedule_id):
 def toggle_schedule(schedule_id):
     """Toggle a schedule on/off."""
     try:
-        db = _get_db()
+        db = get_db()
         row = db.execute('SELECT enabled FROM scheduled_reports WHERE id = ?', (schedule_id,)).fetchone()
         if not row:
-            db.close()
             return False, 'Schedule not found.'
         new_state = 0 if row['enabled'] else 1
-        db.execute('UPDATE scheduled_reports SET enabled = ? WHERE id = ?', (new_state, schedule_id))
-        db.commit()
-        db.close()
+        with db:
+            db.execute('UPDATE scheduled_reports SET enabled = ? WHERE id = ?', (new_state, schedule_id))
         return True, 'Enabled' if new_state else 'Disabled'
     except Exception as e:
         return False, str(e)
@@ -151,12 +183,11 @@ def toggle_schedule(schedule_id):
 
 # Alert rules
 def get_all_alerts():
-    """Get all alert rules."""
+    """Get all alert rules as sqlite3.Row objects (index by column name)."""
     try:
-        db = _get_db()
-        rows = db.execute('SELECT * FROM alert_rules ORDER BY id DESC').fetchall()
-        db.close()
-        return [dict(r) for r in rows]
+        db = get_db()
+        return db.execute(
+            f'SELECT {ALERT_LIST_COLUMNS} FROM alert_rules ORDER BY id DESC').fetchall()
     except Exception:
         return []
 
@@ -164,16 +195,15 @@ def get_all_alerts():
 def create_alert(name, alert_type, recipients, parameters, created_by):
     """Create a new alert rule."""
     try:
-        db = _get_db()
-        db.execute(
-            '''INSERT INTO alert_rules
-               (name, alert_type, recipients, parameters, created_by, created_at)
-               VALUES (?, ?, ?, ?, ?, ?)''',
-            (name, alert_type, recipients, json.dumps(parameters), created_by,
-             datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
-        )
-        db.commit()
-        db.close()
+        db = get_db()
+        with db:
+            db.execute(
+                '''INSERT INTO alert_rules
+                   (name, alert_type, recipients, parameters, created_by, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                (name, alert_type, recipients, _params_json(parameters), created_by,
+                 _utc_now_text())
+            )
         return True, 'Alert rule created.'
     except Exception as e:
         return False, str(e)
@@ -182,10 +212,9 @@ def create_alert(name, alert_type, recipients, parameters, created_by):
 def delete_alert(alert_id):
     """Delete an alert rule."""
     try:
-        db = _get_db()
-        db.execute('DELETE FROM alert_rules WHERE id = ?', (alert_id,))
-        db.commit()
-        db.close()
+        db = get_db()
+        with db:
+            db.execute('DELETE FROM alert_rules WHERE id = ?', (alert_id,))
         return True, 'Alert rule deleted.'
     except Exception as e:
         return False, str(e)
@@ -194,54 +223,120 @@ def delete_alert(alert_id):
 def toggle_alert(alert_id):
     """Toggle an alert rule on/off."""
     try:
-        db = _get_db()
+        db = get_db()
         row = db.execute('SELECT enabled FROM alert_rules WHERE id = ?', (alert_id,)).fetchone()
         if not row:
-            db.close()
             return False, 'Alert not found.'
         new_state = 0 if row['enabled'] else 1
-        db.execute('UPDATE alert_rules SET enabled = ? WHERE id = ?', (new_state, alert_id))
-        db.commit()
-        db.close()
+        with db:
+            db.execute('UPDATE alert_rules SET enabled = ? WHERE id = ?', (new_state, alert_id))
         return True, 'Enabled' if new_state else 'Disabled'
     except Exception as e:
         return False, str(e)
 
 
-def send_email(recipients, subject, html_body):
-    """Send an email using SMTP configuration from environment."""
-    smtp_host = os.environ.get('SMTP_HOST', '')
-    smtp_port = int(os.environ.get('SMTP_PORT', '587'))
-    smtp_user = os.environ.get('SMTP_USER', '')
-    smtp_password = os.environ.get('SMTP_PASSWORD', '')
-    smtp_from = os.environ.get('SMTP_FROM', smtp_user)
-    smtp_tls = os.environ.get('SMTP_TLS', 'true').lower() == 'true'
+SmtpSettings = namedtuple('SmtpSettings', 'host port user password sender tls')
 
-    if not smtp_host:
-        return False, 'SMTP not configured. Set SMTP_HOST environment variable.'
 
-    try:
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = smtp_from
-        msg['To'] = recipients
+def _load_smtp_settings():
+    user = os.environ.get('SMTP_USER', '')
+    return SmtpSettings(
+        host=os.environ.get('SMTP_HOST', ''),
+        port=int(os.environ.get('SMTP_PORT', '587')),
+        user=user,
+        password=os.environ.get('SMTP_PASSWORD', ''),
+        sender=os.environ.get('SMTP_FROM', user),
+        tls=os.environ.get('SMTP_TLS', 'true').lower() == 'true',
+    )
+
+
+# SMTP settings are read from the environment once, at import; changing
+# SMTP_* requires a restart
+_smtp_settings = _load_smtp_settings()
+
+
+# Seconds to wait on the SMTP server for connect and each command
+SMTP_TIMEOUT = 30
 
-        msg.attach(MIMEText(html_body, 'html'))
 
-        if smtp_tls:
-            server = smtplib.SMTP(smtp_host, smtp_port)
-            server.starttls()
-        else:
-            server = smtplib.SMTP(smtp_host, smtp_port)
+def _smtp_connect(smtp):
+    server = smtplib.SMTP(smtp.host, smtp.port, timeout=SMTP_TIMEOUT)
+    if smtp.tls:
+        server.starttls()
+    if smtp.user:
+        server.login(smtp.user, smtp.password)
+    return server
 
-        if smtp_user:
-            server.login(smtp_user, smtp_password)
 
-        server.sendmail(smtp_from, recipients.split(','), msg.as_string())
+def _smtp_quit(server):
+    try:
         server.quit()
-        return True, 'Email sent successfully.'
-    except Exception as e:
-        return False, str(e)
+    except Exception:
+        server.close()
+
+
+@lru_cache(maxsize=128)
+def _split_recipients_csv(recipients):
+    return tuple(r.strip() for r in recipients.split(',') if r.strip())
+
+
+def _split_recipients(recipients):
+    """Normalize a comma-separated string or a list of addresses to a tuple."""
+    if isinstance(recipients, str):
+        return _split_recipients_csv(recipients)
+    return tuple(recipients)
+
+
+def send_emails(messages):
+    """Send several emails over one SMTP session.
+
+    messages is an iterable of (recipients, subject, html_body) tuples, where
+    recipients is a comma-separated string or a list of addresses. The
+    session (TCP + STARTTLS + AUTH) is opened once for the batch and closed
+    when it is done; after a failed message it is reopened for the next one.
+    Returns (sent_count, fail_count, errors).
+    """
+    smtp = _smtp_settings
+    messages = list(messages)
+    if not smtp.host:
+        return 0, len(messages), ['SMTP not configured. Set SMTP_HOST environment variable.']
+
+    sent, errors = 0, []
+    server = None
+    try:
+        for recipients, subject, html_body in messages:
+            msg = MIMEMultipart('alternative')
+            msg['Subject'] = subject
+            msg['From'] = smtp.sender
+            to_addrs = _split_recipients(recipients)
+            msg['To'] = ', '.join(to_addrs)
+            msg.attach(MIMEText(html_body, 'html'))
+
+            try:
+                if server is None:
+                    server = _smtp_connect(smtp)
+                server.sendmail(smtp.sender, list(to_addrs), msg.as_string())
+                sent += 1
+            except Exception as e:
+                errors.append(str(e))
+                if server is not None:
+                    _smtp_quit(server)
+                    server = None
+    finally:
+        if server is not None:
+            _smtp_quit(server)
+    return sent, len(errors), errors
+
+
+def send_email(recipients, subject, html_body):
+    """Send an email using SMTP configuration from environment.
+
+    recipients is a comma-separated string or a list of addresses.
+    """
+    sent, _, errors = send_emails([(recipients, subject, html_body)])
+    if not sent:
+        return False, errors[0]
+    return True, 'Email sent successfully.'
 
 
 def send_test_email(recipients):